@@ -2,9 +2,15 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional
+from cachetools import TTLCache
+from jose import jwt, JWTError
+from pymongo import ReturnDocument
+import asyncio
+import hashlib
 import httpx
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
 from app.core.config import settings
 from app.core.database import get_collection
@@ -26,25 +32,116 @@ class AuthResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+# Shared HTTP client so Identity Toolkit calls reuse pooled keep-alive connections
+http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use."""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return http_client
+
+async def close_http_client():
+    """Close the shared HTTP client."""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+# Authenticated users keyed by SHA-256 of the ID token, skipping the Firebase
+# lookup and the users query on repeat requests with the same token. Each entry
+# holds (user, expires_at) so it never outlives the token's own exp claim.
+USER_CACHE_TTL = 300  # seconds
+user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+
+def invalidate_cached_user(firebase_uid: str):
+    """Drop cached entries for a user after their record changes."""
+    for key, (user, _) in list(user_cache.items()):
+        if user.firebase_uid == firebase_uid:
+            user_cache.pop(key, None)
+
+# Google's x509 certificates for Firebase ID tokens, keyed by kid
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+GOOGLE_CERTS_TTL = 3600  # seconds
+GOOGLE_CERTS_MIN_REFRESH = 60  # seconds between forced refreshes on unknown kid
+
+google_certs: dict = {}
+google_certs_fetched_at: float = 0.0
+
+async def get_google_certs(force_refresh: bool = False) -> dict:
+    """Get Google's token signing certificates, refreshing them hourly."""
+    global google_certs, google_certs_fetched_at
+    age = time.monotonic() - google_certs_fetched_at
+    if not google_certs or age > GOOGLE_CERTS_TTL or (force_refresh and age > GOOGLE_CERTS_MIN_REFRESH):
+        response = await get_http_client().get(GOOGLE_CERTS_URL)
+        response.raise_for_status()
+        google_certs = response.json()
+        google_certs_fetched_at = time.monotonic()
+    return google_certs
+
 async def verify_firebase_token(id_token: str) -> dict:
-    """Verify Firebase ID token."""
+    """Verify Firebase ID token locally against Google's signing certificates."""
+    if not settings.firebase_project_id:
+        return await lookup_firebase_token(id_token)
+    
+    try:
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        certs = await get_google_certs()
+        if kid not in certs:
+            # Keys may have rotated since the last fetch
+            certs = await get_google_certs(force_refresh=True)
+        if kid not in certs:
+            return await lookup_firebase_token(id_token)
+        
+        claims = jwt.decode(
+            id_token,
+            certs[kid],
+            algorithms=["RS256"],
+            audience=settings.firebase_project_id,
+            issuer=f"https://securetoken.google.com/{settings.firebase_project_id}"
+        )
+    except JWTError as e:
+        logger.error(f"Invalid Firebase token: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not fetch Google signing certificates: {e}")
+        return await lookup_firebase_token(id_token)
+    
+    # Same shape as the Identity Toolkit accounts:lookup response
+    return {
+        "localId": claims["sub"],
+        "email": claims.get("email"),
+        "displayName": claims.get("name"),
+        "photoUrl": claims.get("picture")
+    }
+
+async def lookup_firebase_token(id_token: str) -> dict:
+    """Verify Firebase ID token through the Identity Toolkit API."""
     try:
         url = f"https://identitytoolkit.googleapis.com/v1/accounts:lookup?key={settings.firebase_api_key}"
         payload = {"idToken": id_token}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            
-            data = response.json()
-            if "users" in data and len(data["users"]) > 0:
-                return data["users"][0]
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token"
-                )
+        response = await get_http_client().post(url, json=payload)
+        response.raise_for_status()
+        
+        data = response.json()
+        if "users" in data and len(data["users"]) > 0:
+            return data["users"][0]
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
                 
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         logger.error(f"Firebase API error: {e}")
         raise HTTPException(
@@ -58,10 +155,18 @@ async def verify_firebase_token(id_token: str) -> dict:
             detail="Authentication error"
         )
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserResponse:
-    """Get current authenticated user."""
+async def authenticate_token(id_token: str) -> UserResponse:
+    """Resolve a Firebase ID token to the stored user."""
+    cache_key = hashlib.sha256(id_token.encode()).digest()
+    cached = user_cache.get(cache_key)
+    if cached is not None:
+        cached_user, expires_at = cached
+        if time.time() < expires_at:
+            return cached_user
+        user_cache.pop(cache_key, None)
+    
     try:
-        firebase_user = await verify_firebase_token(credentials.credentials)
+        firebase_user = await verify_firebase_token(id_token)
         
         # Get user from database
         users_collection = get_collection("users")
@@ -73,7 +178,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="User not found"
             )
         
-        return UserResponse(**user_doc)
+        user = UserResponse(**user_doc)
+        # The token was verified above, so its exp claim can be trusted
+        expires_at = time.time() + USER_CACHE_TTL
+        try:
+            expires_at = min(expires_at, float(jwt.get_unverified_claims(id_token)["exp"]))
+        except (JWTError, KeyError):
+            pass
+        user_cache[cache_key] = (user, expires_at)
+        return user
         
     except HTTPException:
         raise
@@ -84,6 +197,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Authentication error"
         )
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserResponse:
+    """Get current authenticated user."""
+    return await authenticate_token(credentials.credentials)
+
 @router.post("/login", response_model=AuthResponse)
 async def login(auth_request: FirebaseAuthRequest):
     """Login with Firebase ID token."""
@@ -91,39 +208,31 @@ async def login(auth_request: FirebaseAuthRequest):
         # Verify Firebase token
         firebase_user = await verify_firebase_token(auth_request.id_token)
         
-        # Get or create user in database
+        # Get or create user in database with a single upsert
         users_collection = get_collection("users")
+        firebase_uid = firebase_user["localId"]
+        now = datetime.now(timezone.utc)
         
-        # Check if user exists
-        existing_user = await users_collection.find_one({"firebase_uid": firebase_user["localId"]})
+        user_data = UserCreate(
+            email=firebase_user["email"],
+            display_name=firebase_user.get("displayName"),
+            photo_url=firebase_user.get("photoUrl"),
+            firebase_uid=firebase_uid
+        )
+        new_user = UserInDB(**user_data.model_dump()).model_dump(by_alias=True)
+        new_user.pop("last_login", None)
         
-        if existing_user:
-            # Update last login
-            await users_collection.update_one(
-                {"firebase_uid": firebase_user["localId"]},
-                {"$set": {"last_login": datetime.utcnow()}}
-            )
-            existing_user["_id"] = str(existing_user["_id"])  # Convert ObjectId to string
-            user = UserResponse(**existing_user)
-        else:
-            # Create new user
-            user_data = UserCreate(
-                email=firebase_user["email"],
-                display_name=firebase_user.get("displayName"),
-                photo_url=firebase_user.get("photoUrl"),
-                firebase_uid=firebase_user["localId"]
-            )
-            
-            # Create new user document
-            user_in_db = UserInDB(**user_data.dict())
-            user_dict = user_in_db.model_dump(by_alias=True)
-            
-            # Insert into database
-            result = await users_collection.insert_one(user_dict)
-            
-            # Create response with all fields
-            user_dict["_id"] = str(result.inserted_id)  # Convert ObjectId to string
-            user = UserResponse(**user_dict)
+        user_doc = await users_collection.find_one_and_update(
+            {"firebase_uid": firebase_uid},
+            {
+                "$set": {"last_login": now},
+                "$setOnInsert": new_user
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        user_doc["_id"] = str(user_doc["_id"])  # Convert ObjectId to string
+        user = UserResponse(**user_doc)
         
         return AuthResponse(
             user=user,
@@ -170,6 +279,8 @@ async def update_profile(
             {"$set": update_data}
         )
         
+        invalidate_cached_user(current_user.firebase_uid)
+        
         # Get updated user
         updated_user = await users_collection.find_one({"firebase_uid": current_user.firebase_uid})
         updated_user["_id"] = str(updated_user["_id"])
@@ -194,10 +305,15 @@ async def delete_account(current_user: UserResponse = Depends(get_current_user))
     try:
         users_collection = get_collection("users")
         history_collection = get_collection("history")
+        firebase_uid = current_user.firebase_uid
         
-        # Delete user data
-        await users_collection.delete_one({"firebase_uid": current_user.firebase_uid})
-        await history_collection.delete_many({"user_id": str(current_user.id)})
+        # Delete user data concurrently; history written before the firebase_uid
+        # switch may still be keyed on the user's ObjectId string
+        await asyncio.gather(
+            users_collection.delete_one({"firebase_uid": firebase_uid}),
+            history_collection.delete_many({"user_id": {"$in": [firebase_uid, str(current_user.id)]}})
+        )
+        invalidate_cached_user(firebase_uid)
         
         return {"message": "Account deleted successfully"}
         
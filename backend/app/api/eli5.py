@@ -1,22 +1,31 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal
 import logging
 import time
 from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate
+from app.models.history import build_history_doc
 from app.core.database import get_collection
+from app.services.history_writer import history_writer
 from app.services.ai_service import ai_service
+from app.core.rate_limit import ai_rate_limit
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class ELI5SimplifyRequest(BaseModel):
-    topic: str
-    complexity_level: Optional[str] = "basic"  # basic, intermediate, advanced
+    topic: str = Field(..., max_length=1000)  # 1KB limit for topic
+    complexity_level: Literal["basic", "intermediate", "advanced"] = "basic"
+
+    @field_validator("topic")
+    @classmethod
+    def topic_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Topic cannot be empty")
+        return v
 
 class ELI5SimplifyResponse(BaseModel):
     original_topic: str
@@ -29,31 +38,12 @@ class ELI5SimplifyResponse(BaseModel):
 @router.post("/simplify", response_model=ELI5SimplifyResponse)
 async def simplify_topic(
     request: ELI5SimplifyRequest,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(ai_rate_limit)
 ):
     """Simplify complex topics using ELI5 (Explain Like I'm 5) approach."""
     try:
-        start_time = time.time()
-        
-        # Validate input
-        if not request.topic.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Topic cannot be empty"
-            )
-        
-        if len(request.topic) > 1000:  # 1KB limit for topic
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Topic too long. Maximum 1,000 characters allowed."
-            )
-        
-        valid_complexity_levels = ["basic", "intermediate", "advanced"]
-        if request.complexity_level not in valid_complexity_levels:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid complexity level. Must be one of: {', '.join(valid_complexity_levels)}"
-            )
+        start_time = time.perf_counter()
+        user_id = current_user.firebase_uid
         
         # Process with AI
         result = await ai_service.simplify_topic(request.topic, request.complexity_level)
@@ -64,11 +54,11 @@ async def simplify_topic(
                 detail=f"Topic simplification failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=user_id,
             feature_type="eli5",
             input_data={
                 "topic": request.topic,
@@ -83,8 +73,8 @@ async def simplify_topic(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        # History is written by the background batch writer
+        history_writer.put(history_data)
         
         return ELI5SimplifyResponse(
             original_topic=result["data"]["original_topic"],
@@ -130,55 +120,85 @@ async def get_eli5_stats(current_user: UserResponse = Depends(get_current_user))
     try:
         history_collection = get_collection("history")
         
-        # Get ELI5-related history
-        eli5_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": "eli5"
-        }).to_list(length=None)
+        # Aggregate ELI5-related history server-side
+        pipeline = [
+            {"$match": {
+                "user_id": current_user.firebase_uid,
+                "feature_type": "eli5"
+            }},
+            {"$project": {
+                "_id": 0,
+                "output_data.key_concepts_count": 1,
+                "output_data.examples_count": 1,
+                "output_data.analogies_count": 1,
+                "input_data.complexity_level": 1,
+                "input_data.topic": 1,
+                "processing_time": 1,
+                "created_at": 1
+            }},
+            # Single pass over the documents: per-level partials, then one rollup
+            {"$group": {
+                "_id": {"$ifNull": ["$input_data.complexity_level", "unknown"]},
+                "count": {"$sum": 1},
+                "concepts": {"$sum": "$output_data.key_concepts_count"},
+                "examples": {"$sum": "$output_data.examples_count"},
+                "analogies": {"$sum": "$output_data.analogies_count"},
+                "processing_time": {"$sum": "$processing_time"},
+                "topics": {"$addToSet": "$input_data.topic"},
+                "last_simplified": {"$max": "$created_at"}
+            }},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": "$count"},
+                "concepts": {"$sum": "$concepts"},
+                "examples": {"$sum": "$examples"},
+                "analogies": {"$sum": "$analogies"},
+                "processing_time": {"$sum": "$processing_time"},
+                "topics": {"$push": "$topics"},
+                "last_simplified": {"$max": "$last_simplified"},
+                "complexity": {"$push": {"level": "$_id", "count": "$count"}}
+            }},
+            {"$project": {
+                "total": 1,
+                "concepts": 1,
+                "examples": 1,
+                "analogies": 1,
+                "processing_time": 1,
+                "last_simplified": 1,
+                "complexity": 1,
+                "unique_topics": {"$size": {"$setDifference": [
+                    {"$reduce": {
+                        "input": "$topics",
+                        "initialValue": [],
+                        "in": {"$setUnion": ["$$value", "$$this"]}
+                    }},
+                    ["", None]
+                ]}}
+            }},
+            # Averages are computed and rounded server-side
+            {"$addFields": {
+                "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]}
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
         
-        total_simplified = len(eli5_history)
-        total_concepts = sum(
-            item.get("output_data", {}).get("key_concepts_count", 0) 
-            for item in eli5_history 
-            if item.get("output_data", {}).get("key_concepts_count")
-        )
-        total_examples = sum(
-            item.get("output_data", {}).get("examples_count", 0) 
-            for item in eli5_history 
-            if item.get("output_data", {}).get("examples_count")
-        )
-        total_analogies = sum(
-            item.get("output_data", {}).get("analogies_count", 0) 
-            for item in eli5_history 
-            if item.get("output_data", {}).get("analogies_count")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in eli5_history
-        ) / total_simplified if total_simplified > 0 else 0
+        totals = result[0] if result else {}
         
         # Count by complexity level
-        complexity_counts = {}
-        for item in eli5_history:
-            level = item.get("input_data", {}).get("complexity_level", "unknown")
-            complexity_counts[level] = complexity_counts.get(level, 0) + 1
-        
-        # Get unique topics
-        unique_topics = set()
-        for item in eli5_history:
-            topic = item.get("input_data", {}).get("topic", "")
-            if topic:
-                unique_topics.add(topic)
+        complexity_counts = {
+            item["level"]: item["count"]
+            for item in totals.get("complexity", [])
+        }
         
         return {
-            "total_topics_simplified": total_simplified,
-            "total_concepts_explained": total_concepts,
-            "total_examples_provided": total_examples,
-            "total_analogies_used": total_analogies,
-            "unique_topics": len(unique_topics),
+            "total_topics_simplified": totals.get("total", 0),
+            "total_concepts_explained": totals.get("concepts", 0),
+            "total_examples_provided": totals.get("examples", 0),
+            "total_analogies_used": totals.get("analogies", 0),
+            "unique_topics": totals.get("unique_topics", 0),
             "complexity_breakdown": complexity_counts,
-            "average_processing_time": round(avg_processing_time, 2),
-            "last_simplified": eli5_history[-1]["created_at"] if eli5_history else None
+            "average_processing_time": totals.get("average_processing_time", 0),
+            "last_simplified": totals.get("last_simplified")
         }
         
     except Exception as e:
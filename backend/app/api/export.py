@@ -1,29 +1,88 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
+from cachetools import TTLCache
+import asyncio
+import bleach
+import hashlib
 import logging
 from datetime import datetime
-import pdfkit
+from string import Template
+import html
 import os
-import tempfile
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
 
-logger = logging.getLogger(__name__)
-router = APIRouter()
-
-# Check if wkhtmltopdf is installed and configure pdfkit
 try:
-    config = pdfkit.configuration()
-    logger.info("PDF generation service initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize PDF service: {str(e)}")
-    config = None
+    from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:
+    HTML = None
+    CSS = None
+    FontConfiguration = None
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Rendering is CPU-bound; cap concurrent renders at the core count
+PDF_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+
+# Rendered PDFs keyed by a hash of the final HTML document, bounded to ~50MB
+pdf_cache: TTLCache = TTLCache(maxsize=50 * 1024 * 1024, ttl=3600, getsizeof=len)
+
+# Font configuration and stylesheet are built once at import and reused for every export
+FONT_CONFIG = FontConfiguration() if FontConfiguration is not None else None
+BASE_CSS = CSS(string="""
+    @page { size: A4; margin: 24mm 18mm; }
+    body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', 'Liberation Sans', sans-serif; color: #1f2937; }
+    h1, h2, h3, h4 { color: #111827; margin: 0 0 8px; }
+    h1 { font-size: 22px; }
+    h2 { font-size: 18px; border-bottom: 1px solid #e5e7eb; padding-bottom: 6px; }
+    h3 { font-size: 16px; }
+    p, li, td, th { font-size: 12px; line-height: 1.5; }
+    .meta { color: #6b7280; font-size: 10px; margin-bottom: 16px; }
+    .section { margin: 14px 0; }
+    .pill { display: inline-block; font-size: 10px; background: #eef2ff; color: #3730a3; padding: 2px 8px; border-radius: 9999px; }
+    ul { padding-left: 18px; }
+    table { width: 100%; border-collapse: collapse; margin: 8px 0; }
+    th, td { border: 1px solid #e5e7eb; padding: 6px; text-align: left; }
+    .muted { color: #6b7280; }
+    .small { font-size: 10px; }
+""", font_config=FONT_CONFIG) if CSS is not None else None
+
+
+# Document shell compiled once; only the title and body vary per export
+PDF_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="utf-8" />
+    <title>$title</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+  </head>
+  <body>
+    $body
+  </body>
+</html>
+""")
+
+# Whitelist sanitizer built once; strips scripts, styles, links and unknown markup
+HTML_CLEANER = bleach.Cleaner(
+    tags=[
+        "p", "h1", "h2", "h3", "h4", "ul", "ol", "li",
+        "table", "thead", "tbody", "tr", "td", "th",
+        "strong", "em", "br", "span", "div"
+    ],
+    attributes={"*": ["class"]},
+    strip=True
+)
+
+
+def render_pdf(html_doc: str) -> bytes:
+    """Render an HTML document to PDF bytes (blocking)."""
+    return HTML(string=html_doc).write_pdf(stylesheets=[BASE_CSS], font_config=FONT_CONFIG)
+
 
 class PDFExportRequest(BaseModel):
     html: str
@@ -53,48 +112,24 @@ async def export_pdf(
         filename = payload.filename or f"export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.pdf"
         title = payload.title or "Export"
 
-        base_css = CSS(string="""
-            @page { size: A4; margin: 24mm 18mm; }
-            body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', 'Liberation Sans', sans-serif; color: #1f2937; }
-            h1, h2, h3, h4 { color: #111827; margin: 0 0 8px; }
-            h1 { font-size: 22px; }
-            h2 { font-size: 18px; border-bottom: 1px solid #e5e7eb; padding-bottom: 6px; }
-            h3 { font-size: 16px; }
-            p, li, td, th { font-size: 12px; line-height: 1.5; }
-            .meta { color: #6b7280; font-size: 10px; margin-bottom: 16px; }
-            .section { margin: 14px 0; }
-            .pill { display: inline-block; font-size: 10px; background: #eef2ff; color: #3730a3; padding: 2px 8px; border-radius: 9999px; }
-            ul { padding-left: 18px; }
-            table { width: 100%; border-collapse: collapse; margin: 8px 0; }
-            th, td { border: 1px solid #e5e7eb; padding: 6px; text-align: left; }
-            .muted { color: #6b7280; }
-            .small { font-size: 10px; }
-        """)
-
         # Sanitize HTML content
-        sanitized_html = payload.html.strip().replace('\n', ' ').replace('\r', '')
+        sanitized_html = HTML_CLEANER.clean(payload.html)
         
-        html_doc = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-          <head>
-            <meta charset="utf-8" />
-            <title>{title}</title>
-            <meta name="viewport" content="width=device-width, initial-scale=1" />
-          </head>
-          <body>
-            {sanitized_html}
-          </body>
-        </html>
-        """
+        html_doc = PDF_TEMPLATE.substitute(title=html.escape(title), body=sanitized_html)
         
-        logger.info("Attempting to generate PDF...")
-        try:
-            pdf_bytes = HTML(string=html_doc).write_pdf(stylesheets=[base_css])
-            logger.info("PDF generated successfully")
-        except Exception as e:
-            logger.error(f"PDF generation failed: {str(e)}")
-            raise
+        cache_key = hashlib.blake2b(html_doc.encode(), digest_size=16).digest()
+        pdf_bytes = pdf_cache.get(cache_key)
+        if pdf_bytes is None:
+            logger.info("Attempting to generate PDF...")
+            try:
+                async with PDF_SEMAPHORE:
+                    pdf_bytes = await run_in_threadpool(render_pdf, html_doc)
+                logger.info("PDF generated successfully")
+            except Exception as e:
+                logger.error(f"PDF generation failed: {str(e)}")
+                raise
+            if len(pdf_bytes) <= pdf_cache.maxsize:
+                pdf_cache[cache_key] = pdf_bytes
 
         headers = {
             "Content-Disposition": f"attachment; filename={filename}"
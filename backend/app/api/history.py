@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List
+from cachetools import TTLCache
+import asyncio
+import copy
 import logging
 from datetime import datetime, timedelta
 
@@ -8,11 +11,13 @@ from app.api.auth import get_current_user
 from app.models.user import UserResponse
 from app.models.history import HistoryResponse
 from app.core.database import get_collection
+from app.core.pagination import KEYSET_SORT, encode_cursor, decode_cursor
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 from bson import ObjectId
+from pymongo import WriteConcern
 
 class HistoryItem(BaseModel):
     id: str
@@ -24,28 +29,64 @@ class HistoryItem(BaseModel):
     status: str = "completed"
     created_at: datetime
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
-
 class HistorySummary(BaseModel):
     total_items: int
     feature_breakdown: dict
     recent_activity: List[HistoryItem]
     processing_stats: dict
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+# Fields returned for history rows; everything else stays on the server
+HISTORY_PROJECTION = {
+    "_id": 1,
+    "user_id": 1,
+    "feature_type": 1,
+    "input_data": 1,
+    "output_data": 1,
+    "processing_time": 1,
+    "status": 1,
+    "created_at": 1
+}
+
+# Summary responses keyed by (firebase_uid, days); dashboards poll this endpoint
+summary_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+
+def invalidate_summary_cache(firebase_uid: str):
+    """Drop cached summaries for a user after their history changes."""
+    for key in list(summary_cache.keys()):
+        if key[0] == firebase_uid:
+            summary_cache.pop(key, None)
+
+def history_item_from_doc(item: dict) -> dict:
+    """Build a history response row directly from a Mongo document."""
+    return {
+        "id": str(item["_id"]),
+        "user_id": item.get("user_id"),
+        "feature_type": item.get("feature_type"),
+        "input_data": item.get("input_data", {}),
+        "output_data": item.get("output_data", {}),
+        "processing_time": item.get("processing_time"),
+        "status": item.get("status", "completed"),
+        "created_at": item.get("created_at")
+    }
 
-@router.get("/", response_model=List[HistoryItem])
+@router.get("/", response_model=None)
 async def get_user_history(
+    response: Response,
     feature_type: Optional[str] = Query(None, description="Filter by feature type"),
     limit: int = Query(50, ge=1, le=100, description="Number of items to return"),
-    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    offset: int = Query(0, ge=0, description="Number of items to skip (deprecated, use after)"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get user's processing history with optional filtering."""
+    try:
+        keyset_filter = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
     try:
         history_collection = get_collection("history")
         logger.info(f"Fetching history for user: {current_user.firebase_uid}, feature_type: {feature_type}, limit: {limit}, offset: {offset}")
@@ -53,28 +94,19 @@ async def get_user_history(
         query = {"user_id": current_user.firebase_uid}
         if feature_type:
             query["feature_type"] = feature_type
+        if keyset_filter:
+            query.update(keyset_filter)
         # Get history items
-        cursor = history_collection.find(query).sort("created_at", -1).skip(offset).limit(limit)
-        history_items = await cursor.to_list(length=limit)
+        cursor = history_collection.find(query, HISTORY_PROJECTION).sort(KEYSET_SORT)
+        if offset and not keyset_filter:
+            logger.warning("Offset pagination on /history is deprecated; use the 'after' cursor")
+            cursor = cursor.skip(offset)
+        history_items = await cursor.limit(limit).batch_size(limit).to_list(length=limit)
         logger.info(f"Found {len(history_items)} history items for user {current_user.firebase_uid}")
-        # Convert to response format
-        items = []
-        for item in history_items:
-            try:
-                history_item = HistoryItem(
-                    id=str(item["_id"]),
-                    user_id=item["user_id"],
-                    feature_type=item["feature_type"],
-                    input_data=item["input_data"],
-                    output_data=item["output_data"],
-                    processing_time=item.get("processing_time"),
-                    status=item.get("status", "completed"),
-                    created_at=item["created_at"]
-                )
-                items.append(history_item)
-            except Exception as e:
-                logger.error(f"Error converting history item: {e}, item: {item}")
-                continue
+        if len(history_items) == limit and history_items[-1].get("created_at"):
+            response.headers["X-Next-Cursor"] = encode_cursor(history_items[-1])
+        # Convert to response format without per-row model validation
+        items = [history_item_from_doc(item) for item in history_items]
         return items
     except Exception as e:
         logger.error(f"Error getting user history: {e}", exc_info=True)
@@ -89,6 +121,11 @@ async def get_history_summary(
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get summary of user's processing history."""
+    cache_key = (current_user.firebase_uid, days)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+    
     try:
         history_collection = get_collection("history")
         logger.info(f"Getting history summary for user: {current_user.firebase_uid}, days: {days}")
@@ -103,51 +140,52 @@ async def get_history_summary(
             "created_at": {"$gte": start_date, "$lte": end_date}
         }
         
-        history_items = await history_collection.find(query).sort("created_at", -1).to_list(length=None)
-        logger.info(f"Found {len(history_items)} history items for user {current_user.firebase_uid}")
+        # Counters only need three small fields; full documents are read just for
+        # the ten recent items, which the index serves already sorted
+        pipeline = [
+            {"$match": query},
+            {"$project": {"_id": 0, "feature_type": 1, "processing_time": 1, "status": 1}},
+            {"$facet": {
+                "breakdown": [
+                    {"$group": {"_id": "$feature_type", "count": {"$sum": 1}}}
+                ],
+                "stats": [
+                    {"$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "successful": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                        "processing_time": {"$sum": "$processing_time"}
+                    }}
+                ]
+            }}
+        ]
+        result, recent_docs = await asyncio.gather(
+            history_collection.aggregate(pipeline).to_list(length=1),
+            history_collection.find(query, HISTORY_PROJECTION).sort(KEYSET_SORT).limit(10).to_list(length=10)
+        )
+        facets = result[0] if result else {"breakdown": [], "stats": []}
         
         # Calculate feature breakdown
-        feature_breakdown = {}
-        total_processing_time = 0
-        successful_items = 0
-        
-        for item in history_items:
-            feature_type = item["feature_type"]
-            feature_breakdown[feature_type] = feature_breakdown.get(feature_type, 0) + 1
-            
-            if item.get("processing_time"):
-                total_processing_time += item["processing_time"]
-            
-            if item["status"] == "completed":
-                successful_items += 1
+        feature_breakdown = {item["_id"]: item["count"] for item in facets["breakdown"]}
+        stats = facets["stats"][0] if facets["stats"] else {}
+        total_items = stats.get("total", 0)
+        successful_items = stats.get("successful", 0)
+        total_processing_time = stats.get("processing_time", 0)
+        logger.info(f"Found {total_items} history items for user {current_user.firebase_uid}")
         
         # Get recent activity (last 10 items)
-        recent_items = []
-        for item in history_items[:10]:
-            try:
-                history_item = HistoryItem(
-                    id=str(item["_id"]),
-                    user_id=item["user_id"],
-                    feature_type=item["feature_type"],
-                    input_data=item["input_data"],
-                    output_data=item["output_data"],
-                    processing_time=item.get("processing_time"),
-                    status=item.get("status", "completed"),
-                    created_at=item["created_at"]
-                )
-                recent_items.append(history_item)
-            except Exception as e:
-                logger.error(f"Error converting recent history item: {e}, item: {item}")
-                continue
+        recent_items = [
+            HistoryItem.model_construct(**history_item_from_doc(item))
+            for item in recent_docs
+        ]
         
         # Calculate processing stats
-        total_items = len(history_items)
         avg_processing_time = total_processing_time / total_items if total_items > 0 else 0
         success_rate = (successful_items / total_items * 100) if total_items > 0 else 0
         
         logger.info(f"Summary stats - total_items: {total_items}, success_rate: {success_rate}, avg_time: {avg_processing_time}")
         
-        return HistorySummary(
+        summary = HistorySummary(
             total_items=total_items,
             feature_breakdown=feature_breakdown,
             recent_activity=recent_items,
@@ -157,6 +195,8 @@ async def get_history_summary(
                 "total_processing_time": round(total_processing_time, 2)
             }
         )
+        summary_cache[cache_key] = summary
+        return summary
         
     except Exception as e:
         logger.error(f"Error getting history summary: {e}", exc_info=True)
@@ -177,25 +217,15 @@ async def get_feature_history(
         
         # Get history items for specific feature
         query = {
-            "user_id": str(current_user.id),
+            "user_id": current_user.firebase_uid,
             "feature_type": feature_type
         }
         
-        cursor = history_collection.find(query).sort("created_at", -1).limit(limit)
+        cursor = history_collection.find(query, HISTORY_PROJECTION).sort(KEYSET_SORT).limit(limit).batch_size(limit)
         history_items = await cursor.to_list(length=limit)
         
         # Convert to response format
-        items = []
-        for item in history_items:
-            items.append(HistoryItem(
-                id=str(item["_id"]),
-                feature_type=item["feature_type"],
-                input_data=item["input_data"],
-                output_data=item["output_data"],
-                processing_time=item.get("processing_time"),
-                status=item["status"],
-                created_at=item["created_at"]
-            ))
+        items = [history_item_from_doc(item) for item in history_items]
         
         return {
             "feature_type": feature_type,
@@ -210,6 +240,73 @@ async def get_feature_history(
             detail="Failed to retrieve feature history"
         )
 
+# Static seed payloads for the debug endpoints; each is placed `_offset` before the seed time
+FEATURE_TEMPLATES = (
+    {
+        "feature_type": "eli5",
+        "input_data": {"topic": "Machine Learning", "complexity_level": "easy"},
+        "output_data": {"original_topic": "Machine Learning", "key_concepts_count": 3, "examples_count": 2, "analogies_count": 2},
+        "processing_time": 2.5,
+        "status": "completed",
+        "_offset": timedelta(hours=1)
+    },
+    {
+        "feature_type": "notes",
+        "input_data": {"text": "Sample text for summarization", "max_length": 200},
+        "output_data": {"summary": "Summarized text", "key_points": ["point1", "point2"], "word_count": 50},
+        "processing_time": 1.8,
+        "status": "completed",
+        "_offset": timedelta(hours=2)
+    },
+    {
+        "feature_type": "quiz",
+        "input_data": {"text": "Sample quiz content", "num_questions": 5},
+        "output_data": {"total_questions": 5, "questions_count": 5},
+        "processing_time": 3.2,
+        "status": "completed",
+        "_offset": timedelta(hours=3)
+    },
+    {
+        "feature_type": "pdf",
+        "input_data": {"filename": "test.pdf", "file_size": 1024000, "total_pages": 5},
+        "output_data": {"word_count": 1500, "extraction_method": "pymupdf"},
+        "processing_time": 4.1,
+        "status": "completed",
+        "_offset": timedelta(hours=4)
+    },
+    {
+        "feature_type": "voice",
+        "input_data": {"filename": "audio.mp3", "file_size": 512000, "file_format": "mp3"},
+        "output_data": {"transcription": "Sample transcription", "confidence": 0.95, "word_count": 25},
+        "processing_time": 2.8,
+        "status": "completed",
+        "_offset": timedelta(hours=5)
+    },
+    {
+        "feature_type": "mindmap",
+        "input_data": {"topic": "Artificial Intelligence", "complexity": "intermediate"},
+        "output_data": {"topic": "AI", "branches_count": 4, "subtopics_count": 12},
+        "processing_time": 3.5,
+        "status": "completed",
+        "_offset": timedelta(hours=6)
+    }
+)
+
+def build_seed_items(user_id: str, now: datetime) -> List[dict]:
+    """Build fresh seed documents for a user from FEATURE_TEMPLATES."""
+    return [
+        {
+            "user_id": user_id,
+            "feature_type": t["feature_type"],
+            "input_data": copy.deepcopy(t["input_data"]),
+            "output_data": copy.deepcopy(t["output_data"]),
+            "processing_time": t["processing_time"],
+            "status": t["status"],
+            "created_at": now - t["_offset"]
+        }
+        for t in FEATURE_TEMPLATES
+    ]
+
 @router.post("/seed-test", tags=["Debug"], include_in_schema=False)
 async def seed_test_history(request: Request):
     """Temporary endpoint to seed a test history item for debugging (local dev only)."""
@@ -236,65 +333,13 @@ async def seed_dashboard_test_data(request: Request):
         history_collection = get_collection("history")
         
         # Create test data for different features
-        test_data = [
-            {
-                "user_id": "test-user-id",
-                "feature_type": "eli5",
-                "input_data": {"topic": "Machine Learning", "complexity_level": "easy"},
-                "output_data": {"original_topic": "Machine Learning", "key_concepts_count": 3, "examples_count": 2, "analogies_count": 2},
-                "processing_time": 2.5,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=1)
-            },
-            {
-                "user_id": "test-user-id",
-                "feature_type": "notes",
-                "input_data": {"text": "Sample text for summarization", "max_length": 200},
-                "output_data": {"summary": "Summarized text", "key_points": ["point1", "point2"], "word_count": 50},
-                "processing_time": 1.8,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=2)
-            },
-            {
-                "user_id": "test-user-id",
-                "feature_type": "quiz",
-                "input_data": {"text": "Sample quiz content", "num_questions": 5},
-                "output_data": {"total_questions": 5, "questions_count": 5},
-                "processing_time": 3.2,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=3)
-            },
-            {
-                "user_id": "test-user-id",
-                "feature_type": "pdf",
-                "input_data": {"filename": "test.pdf", "file_size": 1024000, "total_pages": 5},
-                "output_data": {"word_count": 1500, "extraction_method": "pymupdf"},
-                "processing_time": 4.1,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=4)
-            },
-            {
-                "user_id": "test-user-id",
-                "feature_type": "voice",
-                "input_data": {"filename": "audio.mp3", "file_size": 512000, "file_format": "mp3"},
-                "output_data": {"transcription": "Sample transcription", "confidence": 0.95, "word_count": 25},
-                "processing_time": 2.8,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=5)
-            },
-            {
-                "user_id": "test-user-id",
-                "feature_type": "mindmap",
-                "input_data": {"topic": "Artificial Intelligence", "complexity": "intermediate"},
-                "output_data": {"topic": "AI", "branches_count": 4, "subtopics_count": 12},
-                "processing_time": 3.5,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=6)
-            }
-        ]
+        now = datetime.utcnow()
+        test_data = build_seed_items("test-user-id", now)
         
-        # Insert all test data
-        result = await history_collection.insert_many(test_data)
+        # Insert all test data (debug-only: unordered, fire-and-forget write concern)
+        result = await history_collection.with_options(
+            write_concern=WriteConcern(w=0)
+        ).insert_many(test_data, ordered=False)
         
         return {
             "message": f"Seeded {len(test_data)} dashboard test items", 
@@ -313,65 +358,14 @@ async def seed_user_data(request: SeedUserDataRequest):
         history_collection = get_collection("history")
         
         # Create test data for the specified user
-        test_data = [
-            {
-                "user_id": request.user_id,
-                "feature_type": "eli5",
-                "input_data": {"topic": "Machine Learning", "complexity_level": "easy"},
-                "output_data": {"original_topic": "Machine Learning", "key_concepts_count": 3, "examples_count": 2, "analogies_count": 2},
-                "processing_time": 2.5,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=1)
-            },
-            {
-                "user_id": request.user_id,
-                "feature_type": "notes",
-                "input_data": {"text": "Sample text for summarization", "max_length": 200},
-                "output_data": {"summary": "Summarized text", "key_points": ["point1", "point2"], "word_count": 50},
-                "processing_time": 1.8,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=2)
-            },
-            {
-                "user_id": request.user_id,
-                "feature_type": "quiz",
-                "input_data": {"text": "Sample quiz content", "num_questions": 5},
-                "output_data": {"total_questions": 5, "questions_count": 5},
-                "processing_time": 3.2,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=3)
-            },
-            {
-                "user_id": request.user_id,
-                "feature_type": "pdf",
-                "input_data": {"filename": "test.pdf", "file_size": 1024000, "total_pages": 5},
-                "output_data": {"word_count": 1500, "extraction_method": "pymupdf"},
-                "processing_time": 4.1,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=4)
-            },
-            {
-                "user_id": request.user_id,
-                "feature_type": "voice",
-                "input_data": {"filename": "audio.mp3", "file_size": 512000, "file_format": "mp3"},
-                "output_data": {"transcription": "Sample transcription", "confidence": 0.95, "word_count": 25},
-                "processing_time": 2.8,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=5)
-            },
-            {
-                "user_id": request.user_id,
-                "feature_type": "mindmap",
-                "input_data": {"topic": "Artificial Intelligence", "complexity": "intermediate"},
-                "output_data": {"topic": "AI", "branches_count": 4, "subtopics_count": 12},
-                "processing_time": 3.5,
-                "status": "completed",
-                "created_at": datetime.utcnow() - timedelta(hours=6)
-            }
-        ]
+        now = datetime.utcnow()
+        test_data = build_seed_items(request.user_id, now)
         
-        # Insert all test data
-        result = await history_collection.insert_many(test_data)
+        # Insert all test data (debug-only: unordered, fire-and-forget write concern)
+        result = await history_collection.with_options(
+            write_concern=WriteConcern(w=0)
+        ).insert_many(test_data, ordered=False)
+        invalidate_summary_cache(request.user_id)
         
         return {
             "message": f"Seeded {len(test_data)} items for user {request.user_id}", 
@@ -387,24 +381,28 @@ async def delete_history_item(
 ):
     """Delete a specific history item."""
     try:
-        from bson import ObjectId
+        if not ObjectId.is_valid(history_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid id"
+            )
+        oid = ObjectId(history_id)
         
         history_collection = get_collection("history")
         
-        # Verify the item belongs to the user
-        item = await history_collection.find_one({
-            "_id": ObjectId(history_id),
-            "user_id": str(current_user.id)
-        })
+        # Delete only if the item belongs to the user, in a single round trip
+        item = await history_collection.find_one_and_delete(
+            {"_id": oid, "user_id": current_user.firebase_uid},
+            projection={"_id": 1}
+        )
         
-        if not item:
+        if item is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="History item not found"
             )
         
-        # Delete the item
-        await history_collection.delete_one({"_id": ObjectId(history_id)})
+        invalidate_summary_cache(current_user.firebase_uid)
         
         return {"message": "History item deleted successfully"}
         
@@ -427,12 +425,13 @@ async def clear_history(
         history_collection = get_collection("history")
         
         # Build query
-        query = {"user_id": str(current_user.id)}
+        query = {"user_id": current_user.firebase_uid}
         if feature_type:
             query["feature_type"] = feature_type
         
         # Delete items
         result = await history_collection.delete_many(query)
+        invalidate_summary_cache(current_user.firebase_uid)
         
         return {
             "message": f"Cleared {result.deleted_count} history items",
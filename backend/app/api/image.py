@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response, Query
 from fastapi.responses import JSONResponse
-from typing import List
+from typing import List, Optional
+import hashlib
 import time
 import logging
 from datetime import datetime
 from bson import ObjectId
 
-from app.models.image import ImageProcessResponse, ImageHistoryItem
+from app.models.image import ImageProcessResponse
 from app.models.user import UserResponse
 from app.services.image_service import ImageService
 from app.core.database import get_collection
+from app.core.pagination import KEYSET_SORT, encode_cursor, decode_cursor
 from app.api.auth import get_current_user
 
 router = APIRouter(tags=["Image Processing"])
@@ -39,59 +41,67 @@ async def process_image(
                 detail="File must be an image (JPG, PNG, etc.)"
             )
         
-        # Check file size (max 10MB)
-        file_size = 0
-        image_data = b""
-        for chunk in file.file:
-            file_size += len(chunk)
-            image_data += chunk
-            if file_size > 10 * 1024 * 1024:  # 10MB limit
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail="File size too large. Maximum size is 10MB."
-                )
+        # Check file size (max 10MB) with a single bounded read
+        max_size = 10 * 1024 * 1024  # 10MB limit
+        image_data = await file.read(max_size + 1)
+        if len(image_data) > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="File size too large. Maximum size is 10MB."
+            )
+        
+        # Repeat uploads of the same bytes reuse the stored extraction
+        content_hash = hashlib.blake2b(image_data, digest_size=16).hexdigest()
+        image_collection = get_collection("image_history")
+        cached = await image_collection.find_one({
+            "user_id": current_user.firebase_uid,
+            "content_hash": content_hash
+        })
+        if cached:
+            logger.info(f"Reusing stored extraction for user {current_user.firebase_uid}: {file.filename}")
+            return ImageProcessResponse(
+                id=str(cached["_id"]),
+                user_id=cached["user_id"],
+                filename=cached["filename"],
+                extracted_text=cached["extracted_text"],
+                summary=cached["summary"],
+                word_count=cached["word_count"],
+                character_count=cached["character_count"],
+                processing_time=cached.get("processing_time"),
+                status=cached.get("status", "completed"),
+                created_at=cached["created_at"]
+            )
         
         logger.info(f"Processing image for user {current_user.firebase_uid}: {file.filename}")
         
         # Start timing
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Process image
         result = await image_service.process_image(image_data, file.filename)
         
         # Calculate processing time
-        processing_time = time.time() - start_time
-        
-        # Create history item
-        history_item = ImageHistoryItem(
-            user_id=current_user.firebase_uid,
-            filename=file.filename,
-            extracted_text=result["extracted_text"],
-            summary=result["summary"],
-            word_count=result["word_count"],
-            character_count=result["character_count"],
-            processing_time=processing_time,
-            status="completed",
-            created_at=datetime.utcnow()
-        )
+        processing_time = time.perf_counter() - start_time
+        
+        # Build the stored document directly and answer from the same dict
+        doc = {
+            "user_id": current_user.firebase_uid,
+            "filename": file.filename,
+            "extracted_text": result["extracted_text"],
+            "summary": result["summary"],
+            "word_count": result["word_count"],
+            "character_count": result["character_count"],
+            "processing_time": processing_time,
+            "status": "completed",
+            "content_hash": content_hash,
+            "created_at": datetime.utcnow()
+        }
         
         # Store in database
-        image_collection = get_collection("image_history")
-        db_result = await image_collection.insert_one(history_item.dict())
-        
-        # Create response
-        response = ImageProcessResponse(
-            id=str(db_result.inserted_id),
-            user_id=current_user.firebase_uid,
-            filename=file.filename,
-            extracted_text=result["extracted_text"],
-            summary=result["summary"],
-            word_count=result["word_count"],
-            character_count=result["character_count"],
-            processing_time=processing_time,
-            status="completed",
-            created_at=history_item.created_at
-        )
+        db_result = await image_collection.insert_one(doc)
+        doc.pop("_id", None)
+        
+        response = ImageProcessResponse.model_construct(id=str(db_result.inserted_id), **doc)
         
         logger.info(f"Successfully processed image for user {current_user.firebase_uid}")
         return response
@@ -107,20 +117,36 @@ async def process_image(
 
 @router.get("/history", response_model=List[ImageProcessResponse])
 async def get_image_history(
-    limit: int = 20,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Number of items to return"),
+    offset: int = Query(0, ge=0, description="Number of items to skip (deprecated, use after)"),
+    after: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get user's image processing history."""
+    try:
+        keyset_filter = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
     try:
         image_collection = get_collection("image_history")
         
-        # Get history items
-        cursor = image_collection.find(
-            {"user_id": current_user.firebase_uid}
-        ).sort("created_at", -1).skip(offset).limit(limit)
+        # Get history items, continuing after the cursor position if given
+        query = {"user_id": current_user.firebase_uid}
+        if keyset_filter:
+            query.update(keyset_filter)
+        cursor = image_collection.find(query).sort(KEYSET_SORT)
+        if offset and not keyset_filter:
+            logger.warning("Offset pagination on /image/history is deprecated; use the 'after' cursor")
+            cursor = cursor.skip(offset)
         
-        history_items = await cursor.to_list(length=limit)
+        history_items = await cursor.limit(limit).batch_size(limit).to_list(length=limit)
+        if history_items and len(history_items) == limit and history_items[-1].get("created_at"):
+            response.headers["X-Next-Cursor"] = encode_cursor(history_items[-1])
         
         # Convert to response format
         items = []
@@ -155,11 +181,18 @@ async def get_image_detail(
 ):
     """Get specific image processing detail."""
     try:
+        if not ObjectId.is_valid(image_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid id"
+            )
+        oid = ObjectId(image_id)
+        
         image_collection = get_collection("image_history")
         
         # Get specific item
         item = await image_collection.find_one({
-            "_id": ObjectId(image_id),
+            "_id": oid,
             "user_id": current_user.firebase_uid
         })
         
@@ -200,11 +233,18 @@ async def delete_image_record(
 ):
     """Delete specific image processing record."""
     try:
+        if not ObjectId.is_valid(image_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid id"
+            )
+        oid = ObjectId(image_id)
+        
         image_collection = get_collection("image_history")
         
         # Delete item
         result = await image_collection.delete_one({
-            "_id": ObjectId(image_id),
+            "_id": oid,
             "user_id": current_user.firebase_uid
         })
         
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 import logging
 import time
@@ -7,16 +7,26 @@ from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate
+from app.models.history import build_history_doc
 from app.core.database import get_collection
+from app.services.history_writer import history_writer
+from app.core.cache import cached_ai_call
+from app.core.rate_limit import ai_rate_limit
 from app.services.ai_service import ai_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class MindMapCreateRequest(BaseModel):
-    topic: str
-    subtopics: Optional[List[str]] = None
+    topic: str = Field(..., max_length=500)  # 500 char limit for topic
+    subtopics: Optional[List[str]] = Field(None, max_length=10)
+
+    @field_validator("topic")
+    @classmethod
+    def topic_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Topic cannot be empty")
+        return v
 
 class MindMapBranch(BaseModel):
     name: str
@@ -30,33 +40,18 @@ class MindMapCreateResponse(BaseModel):
 @router.post("/create", response_model=MindMapCreateResponse)
 async def create_mindmap(
     request: MindMapCreateRequest,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(ai_rate_limit)
 ):
     """Create a mind map structure for a topic using AI."""
     try:
-        start_time = time.time()
-        
-        # Validate input
-        if not request.topic.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Topic cannot be empty"
-            )
-        
-        if len(request.topic) > 500:  # 500 char limit for topic
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Topic too long. Maximum 500 characters allowed."
-            )
-        
-        if request.subtopics and len(request.subtopics) > 10:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Too many subtopics. Maximum 10 subtopics allowed."
-            )
+        start_time = time.perf_counter()
         
         # Process with AI
-        result = await ai_service.create_mindmap(request.topic, request.subtopics)
+        result = await cached_ai_call(
+            "mindmap",
+            {"topic": request.topic.strip(), "subtopics": request.subtopics or []},
+            lambda: ai_service.create_mindmap(request.topic, request.subtopics)
+        )
         
         if not result["success"]:
             raise HTTPException(
@@ -64,11 +59,11 @@ async def create_mindmap(
                 detail=f"Mind map creation failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="mindmap",
             input_data={
                 "topic": request.topic,
@@ -81,8 +76,7 @@ async def create_mindmap(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         # Convert branches to response format
         branches = []
@@ -113,40 +107,45 @@ async def get_mindmap_stats(current_user: UserResponse = Depends(get_current_use
     try:
         history_collection = get_collection("history")
         
-        # Get mindmap-related history
-        mindmap_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": "mindmap"
-        }).to_list(length=None)
-        
-        total_created = len(mindmap_history)
-        total_branches = sum(
-            item.get("output_data", {}).get("branches_count", 0) 
-            for item in mindmap_history 
-            if item.get("output_data", {}).get("branches_count")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in mindmap_history
-        ) / total_created if total_created > 0 else 0
-        
-        # Average branches per mind map
-        avg_branches_per_mindmap = total_branches / total_created if total_created > 0 else 0
-        
-        # Get unique topics
-        unique_topics = set()
-        for item in mindmap_history:
-            topic = item.get("input_data", {}).get("topic", "")
-            if topic:
-                unique_topics.add(topic)
+        # Aggregate mindmap-related history server-side: per-topic partials, then one
+        # rollup, so distinct topics are counted without collecting them into an array
+        pipeline = [
+            {"$match": {
+                "user_id": current_user.firebase_uid,
+                "feature_type": "mindmap"
+            }},
+            {"$group": {
+                "_id": "$input_data.topic",
+                "count": {"$sum": 1},
+                "branches": {"$sum": "$output_data.branches_count"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_created": {"$max": "$created_at"}
+            }},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": "$count"},
+                "branches": {"$sum": "$branches"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_created": {"$max": "$last_created"},
+                "unique_topics": {"$sum": {"$cond": [{"$in": ["$_id", ["", None]]}, 0, 1]}}
+            }},
+            # Averages are computed and rounded server-side
+            {"$addFields": {
+                "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]},
+                "average_branches": {"$round": [{"$divide": ["$branches", "$total"]}, 1]}
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
+        
+        totals = result[0] if result else {}
         
         return {
-            "total_mindmaps_created": total_created,
-            "total_branches": total_branches,
-            "average_branches_per_mindmap": round(avg_branches_per_mindmap, 1),
-            "unique_topics": len(unique_topics),
-            "average_processing_time": round(avg_processing_time, 2),
-            "last_created": mindmap_history[-1]["created_at"] if mindmap_history else None
+            "total_mindmaps_created": totals.get("total", 0),
+            "total_branches": totals.get("branches", 0),
+            "average_branches_per_mindmap": totals.get("average_branches", 0),
+            "unique_topics": totals.get("unique_topics", 0),
+            "average_processing_time": totals.get("average_processing_time", 0),
+            "last_created": totals.get("last_created")
         }
         
     except Exception as e:
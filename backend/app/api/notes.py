@@ -1,24 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal
 import logging
 import time
 from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate, HistoryInDB
+from app.models.history import build_history_doc, HistoryInDB
 from app.core.database import get_collection
+from app.services.history_writer import history_writer
+from app.core.cache import cached_ai_call
+from app.core.rate_limit import ai_rate_limit
 from app.services.ai_service import ai_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class NotesSummarizeRequest(BaseModel):
-    text: str
-    max_length: Optional[int] = 500
-    summarization_type: Optional[str] = 'abstractive'
-    summary_mode: Optional[str] = 'narrative'
+    text: str = Field(..., max_length=10000)  # 10KB limit
+    max_length: int = Field(500, ge=50, le=2000)  # summary length in words
+    summarization_type: Literal['abstractive', 'extractive'] = 'abstractive'
+    summary_mode: Literal['narrative', 'beginner', 'technical', 'bullet'] = 'narrative'
+
+    @field_validator("text")
+    @classmethod
+    def text_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Text cannot be empty")
+        return v
 
 class NotesSummarizeResponse(BaseModel):
     summary: str
@@ -27,7 +37,14 @@ class NotesSummarizeResponse(BaseModel):
     processing_time: float
 
 class NotesExtractRequest(BaseModel):
-    text: str
+    text: str = Field(..., max_length=10000)  # 10KB limit
+
+    @field_validator("text")
+    @classmethod
+    def text_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Text cannot be empty")
+        return v
 
 class NotesExtractResponse(BaseModel):
     key_points: list
@@ -38,45 +55,27 @@ class NotesExtractResponse(BaseModel):
 @router.post("/summarize", response_model=NotesSummarizeResponse)
 async def summarize_notes(
     request: NotesSummarizeRequest,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(ai_rate_limit)
 ):
     """Summarize long text notes using AI."""
     try:
-        start_time = time.time()
-        
-        # Validate input
-        if not request.text.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text cannot be empty"
-            )
-        
-        if len(request.text) > 10000:  # 10KB limit
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text too long. Maximum 10,000 characters allowed."
-            )
-        
-        # Validate summarization type
-        if request.summarization_type not in ['abstractive', 'extractive']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid summarization type. Must be 'abstractive' or 'extractive'"
-            )
-            
-        # Validate summary mode
-        if request.summary_mode not in ['narrative', 'beginner', 'technical', 'bullet']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid summary mode. Must be 'narrative', 'beginner', 'technical', or 'bullet'"
-            )
+        start_time = time.perf_counter()
         
         # Process with AI
-        result = await ai_service.summarize_notes(
-            text=request.text,
-            max_length=request.max_length,
-            summarization_type=request.summarization_type,
-            summary_mode=request.summary_mode
+        result = await cached_ai_call(
+            "notes_summary",
+            {
+                "text": request.text.strip(),
+                "max_length": request.max_length,
+                "summarization_type": request.summarization_type,
+                "summary_mode": request.summary_mode
+            },
+            lambda: ai_service.summarize_notes(
+                text=request.text,
+                max_length=request.max_length,
+                summarization_type=request.summarization_type,
+                summary_mode=request.summary_mode
+            )
         )
         
         if not result["success"]:
@@ -85,11 +84,11 @@ async def summarize_notes(
                 detail=f"AI processing failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="notes",
             input_data={
                 "text": request.text[:1000],  # Store first 1000 chars
@@ -99,8 +98,7 @@ async def summarize_notes(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         return NotesSummarizeResponse(
             summary=result["data"]["summary"],
@@ -121,27 +119,18 @@ async def summarize_notes(
 @router.post("/extract", response_model=NotesExtractResponse)
 async def extract_key_points(
     request: NotesExtractRequest,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(ai_rate_limit)
 ):
     """Extract key points and important information from text."""
     try:
-        start_time = time.time()
-        
-        # Validate input
-        if not request.text or not request.text.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text cannot be empty"
-            )
-        
-        if len(request.text) > 10000:  # 10KB limit
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text too long. Maximum 10,000 characters allowed."
-            )
+        start_time = time.perf_counter()
         
         # Process with AI
-        result = await ai_service.extract_key_points(request.text)
+        result = await cached_ai_call(
+            "notes_extract",
+            {"text": request.text.strip()},
+            lambda: ai_service.extract_key_points(request.text)
+        )
         
         if not result["success"]:
             error_message = result.get("error", "Unknown error occurred")
@@ -158,11 +147,11 @@ async def extract_key_points(
                 detail="AI service returned invalid response structure"
             )
             
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="notes_extract",
             input_data={
                 "text": request.text[:1000]  # Store first 1000 chars
@@ -171,8 +160,7 @@ async def extract_key_points(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         return NotesExtractResponse(
             key_points=result["data"]["key_points"],
@@ -196,28 +184,33 @@ async def get_notes_stats(current_user: UserResponse = Depends(get_current_user)
     try:
         history_collection = get_collection("history")
         
-        # Get notes-related history
-        notes_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": {"$in": ["notes", "notes_extract"]}
-        }).to_list(length=None)
-        
-        total_processed = len(notes_history)
-        total_words = sum(
-            item.get("output_data", {}).get("word_count", 0) 
-            for item in notes_history 
-            if item.get("output_data", {}).get("word_count")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in notes_history
-        ) / total_processed if total_processed > 0 else 0
+        # Aggregate notes-related history server-side
+        pipeline = [
+            {"$match": {
+                "user_id": current_user.firebase_uid,
+                "feature_type": {"$in": ["notes", "notes_extract"]}
+            }},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "words": {"$sum": "$output_data.word_count"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_processed": {"$max": "$created_at"}
+            }},
+            # Averages are computed and rounded server-side
+            {"$addFields": {
+                "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]}
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
+        
+        totals = result[0] if result else {}
         
         return {
-            "total_processed": total_processed,
-            "total_words": total_words,
-            "average_processing_time": round(avg_processing_time, 2),
-            "last_processed": notes_history[-1]["created_at"] if notes_history else None
+            "total_processed": totals.get("total", 0),
+            "total_words": totals.get("words", 0),
+            "average_processing_time": totals.get("average_processing_time", 0),
+            "last_processed": totals.get("last_processed")
         }
         
     except Exception as e:
@@ -7,8 +7,9 @@ from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate
+from app.models.history import build_history_doc
 from app.core.database import get_collection
+from app.services.history_writer import history_writer
 from app.services.pdf_service import pdf_service
 
 logger = logging.getLogger(__name__)
@@ -39,7 +40,7 @@ async def extract_pdf_text(
 ):
     """Extract text from uploaded PDF file."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Validate file
         if not file.filename:
@@ -54,18 +55,20 @@ async def extract_pdf_text(
                 detail="File must be a PDF"
             )
         
-        # Check file size (10MB limit)
-        file_size = 0
-        pdf_bytes = b""
-        
-        while chunk := await file.read(8192):
-            file_size += len(chunk)
-            if file_size > 10 * 1024 * 1024:  # 10MB
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="File too large. Maximum 10MB allowed."
-                )
-            pdf_bytes += chunk
+        # Check file size (10MB limit) with a single bounded read
+        max_size = 10 * 1024 * 1024  # 10MB
+        if file.size is not None and file.size > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File too large. Maximum 10MB allowed."
+            )
+        pdf_bytes = await file.read(max_size + 1)
+        file_size = len(pdf_bytes)
+        if file_size > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File too large. Maximum 10MB allowed."
+            )
         
         if file_size == 0:
             raise HTTPException(
@@ -82,11 +85,11 @@ async def extract_pdf_text(
                 detail=f"PDF processing failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="pdf",
             input_data={
                 "filename": file.filename,
@@ -100,8 +103,7 @@ async def extract_pdf_text(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         return PDFExtractResponse(
             text=result["data"]["text"],
@@ -181,41 +183,51 @@ async def get_pdf_stats(current_user: UserResponse = Depends(get_current_user)):
     try:
         history_collection = get_collection("history")
         
-        # Get PDF-related history
-        pdf_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": "pdf"
-        }).to_list(length=None)
-        
-        total_processed = len(pdf_history)
-        total_words = sum(
-            item.get("output_data", {}).get("word_count", 0) 
-            for item in pdf_history 
-            if item.get("output_data", {}).get("word_count")
-        )
-        total_pages = sum(
-            item.get("input_data", {}).get("total_pages", 0) 
-            for item in pdf_history 
-            if item.get("input_data", {}).get("total_pages")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in pdf_history
-        ) / total_processed if total_processed > 0 else 0
+        # Aggregate PDF-related history server-side: per-method partials, then one rollup
+        pipeline = [
+            {"$match": {
+                "user_id": current_user.firebase_uid,
+                "feature_type": "pdf"
+            }},
+            {"$group": {
+                "_id": {"$ifNull": ["$output_data.extraction_method", "unknown"]},
+                "count": {"$sum": 1},
+                "words": {"$sum": "$output_data.word_count"},
+                "pages": {"$sum": "$input_data.total_pages"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_processed": {"$max": "$created_at"}
+            }},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": "$count"},
+                "words": {"$sum": "$words"},
+                "pages": {"$sum": "$pages"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_processed": {"$max": "$last_processed"},
+                "methods": {"$push": {"method": "$_id", "count": "$count"}}
+            }},
+            # Averages are computed and rounded server-side
+            {"$addFields": {
+                "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]}
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
+        
+        totals = result[0] if result else {}
         
         # Count by extraction method
-        method_counts = {}
-        for item in pdf_history:
-            method = item.get("output_data", {}).get("extraction_method", "unknown")
-            method_counts[method] = method_counts.get(method, 0) + 1
+        method_counts = {
+            item["method"]: item["count"]
+            for item in totals.get("methods", [])
+        }
         
         return {
-            "total_processed": total_processed,
-            "total_words": total_words,
-            "total_pages": total_pages,
-            "average_processing_time": round(avg_processing_time, 2),
+            "total_processed": totals.get("total", 0),
+            "total_words": totals.get("words", 0),
+            "total_pages": totals.get("pages", 0),
+            "average_processing_time": totals.get("average_processing_time", 0),
             "extraction_methods": method_counts,
-            "last_processed": pdf_history[-1]["created_at"] if pdf_history else None
+            "last_processed": totals.get("last_processed")
         }
         
     except Exception as e:
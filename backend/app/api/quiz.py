@@ -1,14 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import List
 import logging
 import time
 from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate
+from app.models.history import build_history_doc
 from app.core.database import get_collection
+from app.services.history_writer import history_writer
+from app.core.cache import cached_ai_call
+from app.core.rate_limit import ai_rate_limit
 from app.services.ai_service import ai_service
 from app.core.config import settings
 
@@ -16,8 +19,15 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class QuizGenerateRequest(BaseModel):
-    text: str
-    num_questions: Optional[int] = 5
+    text: str = Field(..., max_length=10000)  # 10KB limit
+    num_questions: int = Field(5, ge=1, le=20)
+
+    @field_validator("text")
+    @classmethod
+    def text_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Text cannot be empty")
+        return v
 
 class QuizQuestion(BaseModel):
     question: str
@@ -33,32 +43,13 @@ class QuizGenerateResponse(BaseModel):
 @router.post("/generate", response_model=QuizGenerateResponse)
 async def generate_quiz(
     request: QuizGenerateRequest,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(ai_rate_limit)
 ):
     """Generate quiz questions from text using AI."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         logger.debug(f"Starting quiz generation for user {current_user.id}")
         
-        # Validate input
-        if not request.text.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text cannot be empty"
-            )
-        
-        if len(request.text) > 10000:  # 10KB limit
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text too long. Maximum 10,000 characters allowed."
-            )
-        
-        if request.num_questions < 1 or request.num_questions > 20:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Number of questions must be between 1 and 20"
-            )
-        
         # Check if Gemini API key is configured
         if not settings.gemini_api_key:
             logger.error("Gemini API key not configured")
@@ -69,7 +60,11 @@ async def generate_quiz(
         
         # Process with AI
         logger.debug("Calling AI service to generate quiz")
-        result = await ai_service.generate_quiz(request.text, request.num_questions)
+        result = await cached_ai_call(
+            "quiz",
+            {"text": request.text.strip(), "num_questions": request.num_questions},
+            lambda: ai_service.generate_quiz(request.text, request.num_questions)
+        )
         
         if not result["success"]:
             logger.error(f"Quiz generation failed: {result['error']}")
@@ -78,11 +73,11 @@ async def generate_quiz(
                 detail=f"Quiz generation failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="quiz",
             input_data={
                 "text": request.text[:1000],  # Store first 1000 chars
@@ -95,8 +90,7 @@ async def generate_quiz(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         # Convert questions to response format
         questions = []
@@ -129,32 +123,35 @@ async def get_quiz_stats(current_user: UserResponse = Depends(get_current_user))
     try:
         history_collection = get_collection("history")
         
-        # Get quiz-related history
-        quiz_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": "quiz"
-        }).to_list(length=None)
-        
-        total_generated = len(quiz_history)
-        total_questions = sum(
-            item.get("output_data", {}).get("total_questions", 0) 
-            for item in quiz_history 
-            if item.get("output_data", {}).get("total_questions")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in quiz_history
-        ) / total_generated if total_generated > 0 else 0
-        
-        # Average questions per quiz
-        avg_questions_per_quiz = total_questions / total_generated if total_generated > 0 else 0
+        # Aggregate quiz-related history server-side
+        pipeline = [
+            {"$match": {
+                "user_id": current_user.firebase_uid,
+                "feature_type": "quiz"
+            }},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "questions": {"$sum": "$output_data.total_questions"},
+                "processing_time": {"$sum": "$processing_time"},
+                "last_generated": {"$max": "$created_at"}
+            }},
+            # Averages are computed and rounded server-side
+            {"$addFields": {
+                "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]},
+                "average_questions": {"$round": [{"$divide": ["$questions", "$total"]}, 1]}
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
+        
+        totals = result[0] if result else {}
         
         return {
-            "total_quizzes_generated": total_generated,
-            "total_questions": total_questions,
-            "average_questions_per_quiz": round(avg_questions_per_quiz, 1),
-            "average_processing_time": round(avg_processing_time, 2),
-            "last_generated": quiz_history[-1]["created_at"] if quiz_history else None
+            "total_quizzes_generated": totals.get("total", 0),
+            "total_questions": totals.get("questions", 0),
+            "average_questions_per_quiz": totals.get("average_questions", 0),
+            "average_processing_time": totals.get("average_processing_time", 0),
+            "last_generated": totals.get("last_generated")
         }
         
     except Exception as e:
@@ -1,22 +1,46 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+import asyncio
 import logging
 from datetime import datetime
 
 from app.api.auth import get_current_user
 from app.models.user import UserResponse
 from app.core.database import get_collection
+from app.core.cache import cached_ai_call
+from app.core.responses import stream_json_array
+from app.services.history_writer import research_history_writer
 from app.services.research_service import research_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# History lists searches, not full analyses; leave abstracts, summaries and comparisons on the server
+RESEARCH_HISTORY_PROJECTION = {
+    "_id": 1,
+    "topic": 1,
+    "timestamp": 1,
+    "preferences": 1,
+    "papers.title": 1,
+    "papers.authors": 1,
+    "papers.year": 1,
+    "papers.url": 1
+}
+
 class ResearchSearchRequest(BaseModel):
-    topic: str
-    num_papers: Optional[int] = 5
-    summarization_type: Optional[str] = 'abstractive'
-    summary_mode: Optional[str] = 'technical'
+    topic: str = Field(..., max_length=500)
+    num_papers: int = Field(5, ge=1, le=20)
+    summarization_type: Literal['abstractive', 'extractive'] = 'abstractive'
+    summary_mode: Literal['narrative', 'beginner', 'technical', 'bullet'] = 'technical'
+
+    @field_validator("topic")
+    @classmethod
+    def topic_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Search topic cannot be empty")
+        return v
 
 class ResearchPaperResponse(BaseModel):
     title: str
@@ -40,82 +64,80 @@ async def search_research_papers(
 ):
     """Search and analyze research papers."""
     try:
-        # Validate input
-        if not request.topic.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search topic cannot be empty"
-            )
-
-        # Validate summarization options
-        if request.summarization_type not in ['abstractive', 'extractive']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid summarization type"
-            )
-
-        if request.summary_mode not in ['narrative', 'beginner', 'technical', 'bullet']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid summary mode"
-            )
-
         # Search for papers
         papers = await research_service.search_papers(request.topic, request.num_papers)
         
         if not papers:
-            return ResearchSearchResponse(
-                papers=[],
-                comparative_analysis=None,
-                message="No papers found. Try modifying your search terms or increasing the number of papers."
-            )
+            return {
+                "papers": [],
+                "comparative_analysis": None
+            }
 
-        # Process each paper
-        processed_papers = []
-        for paper in papers:
-            try:
-                # Generate summary if abstract is available
-                summary = await research_service.generate_summary(
+        async def process_paper(paper: dict) -> dict:
+            # Generate summary if abstract is available
+            summary = await cached_ai_call(
+                "research_summary",
+                {
+                    "abstract": paper['abstract'],
+                    "summarization_type": request.summarization_type,
+                    "summary_mode": request.summary_mode
+                },
+                lambda: research_service.generate_summary(
                     paper['abstract'],
                     request.summarization_type,
                     request.summary_mode
-                ) if paper['abstract'] else {
-                    "summary": "Abstract not available for summarization.",
-                    "key_findings": ["Unable to extract key findings without abstract."],
-                    "methodology": "Not available",
-                    "implications": "Not available"
-                }
+                )
+            ) if paper['abstract'] else {
+                "summary": "Abstract not available for summarization.",
+                "key_findings": ["Unable to extract key findings without abstract."],
+                "methodology": "Not available",
+                "implications": "Not available"
+            }
 
-                # Generate citations
-                citations = research_service.generate_citations(paper)
+            # Generate citations
+            citations = research_service.generate_citations(paper)
 
-                # Combine all information
-                processed_paper = {
-                    **paper,
-                    'summary': summary,
-                    'citations_format': citations
-                }
-                processed_papers.append(processed_paper)
-            except Exception as e:
-                logger.error(f"Error processing paper {paper.get('title')}: {str(e)}")
-                continue
+            # Combine all information
+            return {
+                **paper,
+                'summary': summary,
+                'citations_format': citations
+            }
 
-        # Generate comparative analysis if multiple papers
-        comparative_analysis = None
-        if len(processed_papers) > 1:
+        async def compare_papers() -> Optional[dict]:
+            # Generate comparative analysis if multiple papers
+            if len(papers) < 2:
+                return None
             try:
-                comparative_analysis = await research_service.generate_comparative_analysis(
+                return await research_service.generate_comparative_analysis(
                     papers,
                     request.summarization_type,
                     request.summary_mode
                 )
             except Exception as e:
                 logger.error(f"Error generating comparative analysis: {str(e)}")
+                return None
+
+        # Process all papers and the comparative analysis concurrently
+        results, comparative_analysis = await asyncio.gather(
+            asyncio.gather(*(process_paper(paper) for paper in papers), return_exceptions=True),
+            compare_papers()
+        )
+
+        processed_papers = []
+        for paper, result in zip(papers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing paper {paper.get('title')}: {str(result)}")
+                continue
+            processed_papers.append(result)
+
+        if len(processed_papers) < 2:
+            comparative_analysis = None
 
-        # Save to database
+        # Save to database; written by the background batch writer
         try:
             search_record = {
-                "user_id": str(current_user.id),
+                "user_id": current_user.firebase_uid,
                 "topic": request.topic,
                 "timestamp": datetime.utcnow(),
                 "papers": processed_papers,
@@ -127,16 +149,14 @@ async def search_research_papers(
                 }
             }
 
-            research_collection = get_collection("research_history")
-            await research_collection.insert_one(search_record)
+            research_history_writer.put(search_record)
         except Exception as e:
             logger.error(f"Error saving to database: {str(e)}")
 
-        return ResearchSearchResponse(
-            papers=processed_papers,
-            comparative_analysis=comparative_analysis,
-            message="Successfully retrieved and analyzed papers."
-        )    
+        return {
+            "papers": processed_papers,
+            "comparative_analysis": comparative_analysis
+        }
     except Exception as e:
         logger.error(f"Error in research paper search: {str(e)}")
         raise HTTPException(
@@ -151,11 +171,13 @@ async def get_research_history(
     """Get user's research search history."""
     try:
         research_collection = get_collection("research_history")
-        history = await research_collection.find(
-            {"user_id": str(current_user.id)}
-        ).sort("timestamp", -1).to_list(length=100)
+        cursor = research_collection.find(
+            {"user_id": current_user.firebase_uid},
+            RESEARCH_HISTORY_PROJECTION
+        ).sort("timestamp", -1).limit(100).batch_size(20)
         
-        return history
+        # Stream records instead of materializing all 100
+        return StreamingResponse(stream_json_array(cursor), media_type="application/json")
     except Exception as e:
         logger.error(f"Error fetching research history: {str(e)}")
         raise HTTPException(
@@ -1,32 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
 import logging
 import time
 import os
 import json
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import PurePath
 
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, authenticate_token
 from app.models.user import UserResponse
-from app.models.history import HistoryCreate
+from app.models.history import build_history_doc
 from app.models.voice import EmotionAnalysisResponse
 from app.core.database import get_collection
-from app.services.voice_service import voice_service
-from app.services.emotion_analysis_service import analyze_voice_emotion
-from app.core.config import settings
-import logging
-import time
-import os
-import json
-from datetime import datetime
-
-from app.api.auth import get_current_user
-from app.models.user import UserResponse
-from app.models.history import HistoryCreate
-from app.models.voice import EmotionAnalysisResponse
-from app.core.database import get_collection
-from app.services.voice_service import voice_service
+from app.services.history_writer import history_writer
+from app.core.cache import cached_ai_call
+from app.services.voice_service import voice_service, SUPPORTED_AUDIO_FORMATS
 from app.services.emotion_analysis_service import analyze_voice_emotion
 from app.core.config import settings
 
@@ -36,6 +27,43 @@ logging.basicConfig(level=logging.DEBUG)
 
 router = APIRouter()
 
+SUPPORTED_FORMATS = frozenset(SUPPORTED_AUDIO_FORMATS)
+SUPPORTED_FORMATS_STR = ", ".join(SUPPORTED_AUDIO_FORMATS)
+# Static for the process lifetime; served as-is by /formats
+SUPPORTED_FORMATS_RESPONSE = voice_service.get_supported_formats()
+
+# Voice stats only cover recent history so the aggregation stays bounded as history grows
+STATS_WINDOW_DAYS = 90
+
+# Leading bytes each container must start with, checked before any decoding
+AUDIO_HEADER_BYTES = 12
+
+def matches_audio_signature(file_extension: str, header: bytes) -> bool:
+    """Check that an upload's leading bytes match the container its extension claims."""
+    if file_extension == "wav":
+        return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    if file_extension == "mp3":
+        # ID3 tag, or a bare MPEG frame sync
+        return header[:3] == b"ID3" or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0)
+    if file_extension == "m4a":
+        return header[4:8] == b"ftyp"
+    if file_extension == "flac":
+        return header[:4] == b"fLaC"
+    if file_extension == "ogg":
+        return header[:4] == b"OggS"
+    if file_extension == "webm":
+        return header[:4] == b"\x1a\x45\xdf\xa3"
+    return False
+
+# Streaming transcription: 16-bit mono PCM, re-transcribed after each second of new
+# audio over a rolling window that is committed once it reaches its maximum length
+STREAM_SAMPLE_WIDTH = 2
+STREAM_STEP_SECONDS = 1
+STREAM_WINDOW_SECONDS = 30
+STREAM_MAX_SECONDS = 300
+# The ID token arrives as the first message, not in the logged query string
+STREAM_AUTH_TIMEOUT_SECONDS = 10
+
 class TimestampModel(BaseModel):
     word: str
     start_time: float
@@ -69,6 +97,11 @@ class VoiceAnalysisResponse(BaseModel):
     suggested_improvements: List[str]
     processing_time: float
 
+class VoiceProcessResponse(BaseModel):
+    summary: VoiceSummarizeResponse
+    analysis: VoiceAnalysisResponse
+    processing_time: float
+
 class VoiceMicrophoneRequest(BaseModel):
     duration: Optional[int] = 10
     save_recording: Optional[bool] = True
@@ -83,9 +116,8 @@ async def transcribe_audio_file(
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Transcribe uploaded audio file to text."""
-    temp_file_path = None
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         logger.debug(f"Starting audio transcription for file: {file.filename}")
         
         # Validate file
@@ -95,72 +127,28 @@ async def transcribe_audio_file(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No file provided"
             )
-            
-        # Check file size before reading
-        MAX_SIZE = 10 * 1024 * 1024  # 10MB
-        file_size = 0
-        chunk_size = 8192
-        
-        # Read file in chunks to check size
-        while chunk := await file.read(chunk_size):
-            file_size += len(chunk)
-            if file_size > MAX_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="File size exceeds 10MB limit"
-                )
-            
-        # Reset file position for later reading
-        await file.seek(0)
         
         # Get file extension
-        file_extension = file.filename.split('.')[-1].lower()
-        supported_formats = voice_service.get_supported_formats()["data"]["supported_formats"]
+        file_extension = PurePath(file.filename).suffix.lstrip('.').lower()
         
-        if file_extension not in supported_formats:
+        if file_extension not in SUPPORTED_FORMATS:
             logger.error(f"Unsupported format: {file_extension}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported file format. Supported formats: {', '.join(supported_formats)}"
+                detail=f"Unsupported file format. Supported formats: {SUPPORTED_FORMATS_STR}"
             )
         
-        # Create temporary directories if they don't exist
-        for dir_path in [
-            os.path.join(os.getcwd(), "uploads"),
-            os.path.join(os.getcwd(), "uploads", "temp"),
-            os.path.join(os.getcwd(), "uploads", "audio")
-        ]:
-            os.makedirs(dir_path, exist_ok=True)
-        
-        # Generate unique temp file path
-        timestamp = int(time.time() * 1000)
-        safe_filename = "".join(c for c in file.filename if c.isalnum() or c in "._- ")
-        temp_file_path = os.path.join(
-            os.getcwd(), 
-            "uploads", 
-            "temp", 
-            f"upload_{timestamp}_{safe_filename}"
-        )
-        
-        logger.debug(f"Saving uploaded file to: {temp_file_path}")
+        # The upload is already spooled by Starlette; measure it without reading it
+        file_size = file.size
+        if file_size is None:
+            file_size = file.file.seek(0, os.SEEK_END)
+            await file.seek(0)
         
-        # Save uploaded file
-        file_size = 0
-        try:
-            with open(temp_file_path, "wb") as temp_file:
-                while chunk := await file.read(8192):
-                    file_size += len(chunk)
-                    if file_size > 10 * 1024 * 1024:  # 10MB
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="File too large. Maximum 10MB allowed."
-                        )
-                    temp_file.write(chunk)
-        except Exception as e:
-            logger.error(f"Error saving file: {str(e)}")
+        MAX_SIZE = 10 * 1024 * 1024  # 10MB
+        if file_size > MAX_SIZE:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error saving file: {str(e)}"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File size exceeds 10MB limit"
             )
         
         if file_size == 0:
@@ -170,19 +158,19 @@ async def transcribe_audio_file(
                 detail="Empty file"
             )
         
-        logger.debug(f"File saved successfully. Size: {file_size} bytes")
-        
-        # Check if file exists and is readable
-        if not os.path.exists(temp_file_path):
-            logger.error(f"Saved file not found: {temp_file_path}")
+        # Reject mislabeled files before FFmpeg or the recognizer see them
+        header = await file.read(AUDIO_HEADER_BYTES)
+        await file.seek(0)
+        if not matches_audio_signature(file_extension, header):
+            logger.error(f"Upload content does not match format: {file_extension}")
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error saving file"
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"File content is not a valid {file_extension} file"
             )
         
-        # Process audio
+        # Process audio straight from the spooled upload
         try:
-            result = await voice_service.transcribe_audio_file(temp_file_path, file_extension)
+            result = await voice_service.transcribe_audio_stream(file.file, file_extension)
         except Exception as e:
             logger.error(f"Error during transcription: {str(e)}")
             raise HTTPException(
@@ -197,12 +185,12 @@ async def transcribe_audio_file(
                 detail=f"Transcription failed: {result.get('error', 'Unknown error')}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         logger.debug(f"Transcription completed in {processing_time:.2f} seconds")
             
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="voice",
             input_data={
                 "filename": file.filename,
@@ -213,8 +201,7 @@ async def transcribe_audio_file(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         # Add processing time to result
         result["data"]["processing_time"] = processing_time
@@ -228,14 +215,210 @@ async def transcribe_audio_file(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to transcribe audio"
         )
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
+
+@router.post("/transcribe/raw", response_model=VoiceTranscribeResponse)
+async def transcribe_raw_audio(
+    request: Request,
+    file_format: str = Query("wav"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Transcribe audio sent as the raw request body (application/octet-stream)."""
+    try:
+        start_time = time.perf_counter()
+        
+        file_extension = file_format.lower()
+        if file_extension not in SUPPORTED_FORMATS:
+            logger.error(f"Unsupported format: {file_extension}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported file format. Supported formats: {SUPPORTED_FORMATS_STR}"
+            )
+        
+        # Spool the body as it arrives; no multipart or base64 decoding, one copy
+        MAX_SIZE = 10 * 1024 * 1024  # 10MB
+        file_size = 0
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as audio_file:
+            async for chunk in request.stream():
+                file_size += len(chunk)
+                if file_size > MAX_SIZE:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="File size exceeds 10MB limit"
+                    )
+                audio_file.write(chunk)
+            
+            if file_size == 0:
+                logger.error("Empty audio body")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Empty file"
+                )
+            
+            # Reject mislabeled audio before FFmpeg or the recognizer see it
+            audio_file.seek(0)
+            if not matches_audio_signature(file_extension, audio_file.read(AUDIO_HEADER_BYTES)):
+                logger.error(f"Request body does not match format: {file_extension}")
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail=f"File content is not a valid {file_extension} file"
+                )
+            
             try:
-                os.remove(temp_file_path)
-                logger.debug(f"Removed temporary file: {temp_file_path}")
+                result = await voice_service.transcribe_audio_stream(audio_file, file_extension)
             except Exception as e:
-                logger.warning(f"Failed to remove temporary file: {str(e)}")
+                logger.error(f"Error during transcription: {str(e)}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error during transcription: {str(e)}"
+                )
+        
+        if not result["success"]:
+            logger.error(f"Transcription failed: {result.get('error', 'Unknown error')}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Transcription failed: {result.get('error', 'Unknown error')}"
+            )
+        
+        processing_time = time.perf_counter() - start_time
+        
+        # Save to history
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
+            feature_type="voice",
+            input_data={
+                "filename": None,
+                "file_size": file_size,
+                "file_format": file_extension
+            },
+            output_data=result["data"],
+            processing_time=processing_time
+        )
+        
+        history_writer.put(history_data)
+        
+        result["data"]["processing_time"] = processing_time
+        return result["data"]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error transcribing raw audio: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to transcribe audio"
+        )
+
+def agreed_prefix(previous: List[str], current: List[str]) -> List[str]:
+    """Longest common word prefix of two consecutive hypotheses (LocalAgreement-2)."""
+    count = 0
+    for a, b in zip(previous, current):
+        if a.lower() != b.lower():
+            break
+        count += 1
+    return current[:count]
+
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket, sample_rate: int = 16000):
+    """Transcribe streamed PCM audio, sending partial transcripts as they stabilize.
+
+    The client first sends its Firebase ID token as a text message, then binary
+    frames of 16-bit mono PCM at ``sample_rate`` and a text "end" message when
+    done; the server replies with ``{"partial": ...}`` updates and a closing
+    ``{"final": ...}``.
+    """
+    if not 8000 <= sample_rate <= 48000:
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+        return
+    
+    await websocket.accept()
+    try:
+        token = await asyncio.wait_for(websocket.receive_text(), timeout=STREAM_AUTH_TIMEOUT_SECONDS)
+        current_user = await authenticate_token(token)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, KeyError, HTTPException):
+        # KeyError: the first frame was binary rather than the token
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    start_time = time.perf_counter()
+    bytes_per_second = sample_rate * STREAM_SAMPLE_WIDTH
+    buffer = bytearray()
+    received = 0
+    pending = 0
+    committed: List[str] = []
+    previous: List[str] = []
+    stable: List[str] = []
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            if message.get("bytes"):
+                chunk = message["bytes"]
+                buffer.extend(chunk)
+                received += len(chunk)
+                pending += len(chunk)
+                if received > STREAM_MAX_SECONDS * bytes_per_second:
+                    await websocket.send_json({"error": f"Stream exceeds {STREAM_MAX_SECONDS} seconds"})
+                    break
+                if pending < STREAM_STEP_SECONDS * bytes_per_second:
+                    continue
+            elif message.get("text") == "end":
+                break
+            else:
+                continue
+            
+            pending = 0
+            hypothesis = (await voice_service.transcribe_chunk(bytes(buffer), sample_rate, STREAM_SAMPLE_WIDTH)).split()
+            
+            # Only words two consecutive hypotheses agree on are shown as stable
+            agreed = agreed_prefix(previous, hypothesis)
+            if len(agreed) > len(stable):
+                stable = agreed
+            previous = hypothesis
+            
+            if len(buffer) >= STREAM_WINDOW_SECONDS * bytes_per_second:
+                committed.extend(hypothesis)
+                buffer.clear()
+                previous = []
+                stable = []
+            
+            await websocket.send_json({"partial": " ".join(committed + stable)})
+        
+        if buffer:
+            committed.extend((await voice_service.transcribe_chunk(bytes(buffer), sample_rate, STREAM_SAMPLE_WIDTH)).split())
+        
+        transcription = " ".join(committed)
+        processing_time = time.perf_counter() - start_time
+        
+        # Save to history
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
+            feature_type="voice_stream",
+            input_data={
+                "duration": round(received / bytes_per_second, 2),
+                "sample_rate": sample_rate
+            },
+            output_data={
+                "transcription": transcription,
+                "word_count": len(committed)
+            },
+            processing_time=processing_time
+        )
+        
+        history_writer.put(history_data)
+        
+        await websocket.send_json({"final": transcription, "word_count": len(committed)})
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        logger.debug("Transcription stream disconnected")
+    except Exception as e:
+        logger.error(f"Error transcribing audio stream: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
 
 @router.post("/microphone", response_model=VoiceTranscribeResponse)
 async def transcribe_microphone(
@@ -244,7 +427,7 @@ async def transcribe_microphone(
 ):
     """Transcribe audio from microphone in real-time."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Validate duration
         if request.duration < 1 or request.duration > 60:
@@ -262,11 +445,11 @@ async def transcribe_microphone(
                 detail=f"Transcription failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="voice_microphone",
             input_data={
                 "duration": request.duration
@@ -275,8 +458,7 @@ async def transcribe_microphone(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         return VoiceTranscribeResponse(
             transcription=result["data"]["transcription"],
@@ -297,7 +479,7 @@ async def transcribe_microphone(
 @router.get("/formats")
 async def get_supported_formats():
     """Get list of supported audio formats."""
-    return voice_service.get_supported_formats()
+    return SUPPORTED_FORMATS_RESPONSE
 
 @router.post("/summarize", response_model=VoiceSummarizeResponse)
 async def summarize_transcription(
@@ -306,7 +488,7 @@ async def summarize_transcription(
 ):
     """Generate a summary of transcribed audio content."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Validate input
         if not request.transcription.strip():
@@ -316,9 +498,13 @@ async def summarize_transcription(
             )
         
         # Process with AI
-        result = await voice_service.summarize_audio(
-            request.transcription, 
-            request.max_length
+        result = await cached_ai_call(
+            "voice_summary",
+            {"transcription": request.transcription.strip(), "max_length": request.max_length},
+            lambda: voice_service.summarize_audio(
+                request.transcription, 
+                request.max_length
+            )
         )
         
         if not result["success"]:
@@ -327,14 +513,14 @@ async def summarize_transcription(
                 detail=f"Summarization failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
-        # Add processing time to the result
-        result["data"]["processing_time"] = processing_time
+        # Add processing time to a copy; the cached result is shared between requests
+        data = {**result["data"], "processing_time": processing_time}
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="voice_summary",
             input_data={
                 "transcription_length": len(request.transcription.split()),
@@ -347,10 +533,9 @@ async def summarize_transcription(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
-        return result["data"]
+        return data
         
     except HTTPException:
         raise
@@ -368,7 +553,7 @@ async def analyze_transcription(
 ):
     """Analyze transcribed audio content for key points and sentiment."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Validate input
         if not request.transcription.strip():
@@ -378,7 +563,11 @@ async def analyze_transcription(
             )
         
         # Process with AI
-        result = await voice_service.analyze_audio_content(request.transcription)
+        result = await cached_ai_call(
+            "voice_analysis",
+            {"transcription": request.transcription.strip()},
+            lambda: voice_service.analyze_audio_content(request.transcription)
+        )
         
         if not result["success"]:
             raise HTTPException(
@@ -386,14 +575,14 @@ async def analyze_transcription(
                 detail=f"Analysis failed: {result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
-        # Add processing time to the result
-        result["data"]["processing_time"] = processing_time
+        # Add processing time to a copy; the cached result is shared between requests
+        data = {**result["data"], "processing_time": processing_time}
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="voice_analysis",
             input_data={
                 "transcription_length": len(request.transcription.split())
@@ -406,10 +595,9 @@ async def analyze_transcription(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
-        return result["data"]
+        return data
         
     except HTTPException:
         raise
@@ -420,42 +608,157 @@ async def analyze_transcription(
             detail="Failed to analyze transcription"
         )
 
+@router.post("/process", response_model=VoiceProcessResponse)
+async def process_transcription(
+    request: VoiceSummarizeRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Summarize and analyze transcribed audio content in one request."""
+    try:
+        start_time = time.perf_counter()
+        
+        # Validate input
+        if not request.transcription.strip():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Transcription cannot be empty"
+            )
+        
+        # Summary and analysis are independent; run both AI calls concurrently
+        summary_result, analysis_result = await asyncio.gather(
+            cached_ai_call(
+                "voice_summary",
+                {"transcription": request.transcription.strip(), "max_length": request.max_length},
+                lambda: voice_service.summarize_audio(
+                    request.transcription,
+                    request.max_length
+                )
+            ),
+            cached_ai_call(
+                "voice_analysis",
+                {"transcription": request.transcription.strip()},
+                lambda: voice_service.analyze_audio_content(request.transcription)
+            )
+        )
+        
+        if not summary_result["success"]:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Summarization failed: {summary_result['error']}"
+            )
+        
+        if not analysis_result["success"]:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Analysis failed: {analysis_result['error']}"
+            )
+        
+        processing_time = time.perf_counter() - start_time
+        summary = summary_result["data"]
+        analysis = analysis_result["data"]
+        
+        # Save to history as the two features it combines
+        transcription_length = len(request.transcription.split())
+        history_writer.put(build_history_doc(
+            user_id=current_user.firebase_uid,
+            feature_type="voice_summary",
+            input_data={
+                "transcription_length": transcription_length,
+                "max_length": request.max_length
+            },
+            output_data={
+                "summary_length": len(summary["summary"].split()),
+                "main_points_count": len(summary["main_points"])
+            },
+            processing_time=processing_time
+        ))
+        history_writer.put(build_history_doc(
+            user_id=current_user.firebase_uid,
+            feature_type="voice_analysis",
+            input_data={
+                "transcription_length": transcription_length
+            },
+            output_data={
+                "sentiment": analysis["sentiment"],
+                "clarity_score": analysis["clarity_score"],
+                "topics_count": len(analysis["topics_discussed"])
+            },
+            processing_time=processing_time
+        ))
+        
+        return {
+            "summary": {**summary, "processing_time": processing_time},
+            "analysis": {**analysis, "processing_time": processing_time},
+            "processing_time": processing_time
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing transcription: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process transcription"
+        )
+
 @router.get("/stats")
 async def get_voice_stats(current_user: UserResponse = Depends(get_current_user)):
     """Get user's voice processing statistics."""
     try:
         history_collection = get_collection("history")
         
-        # Get voice-related history
-        voice_history = await history_collection.find({
-            "user_id": str(current_user.id),
-            "feature_type": {"$in": ["voice", "voice_microphone"]}
-        }).to_list(length=None)
-        
-        total_processed = len(voice_history)
-        total_words = sum(
-            item.get("output_data", {}).get("word_count", 0) 
-            for item in voice_history 
-            if item.get("output_data", {}).get("word_count")
-        )
-        avg_processing_time = sum(
-            item.get("processing_time", 0) 
-            for item in voice_history
-        ) / total_processed if total_processed > 0 else 0
+        query = {
+            "user_id": current_user.firebase_uid,
+            "feature_type": {"$in": ["voice", "voice_microphone"]},
+            "created_at": {"$gte": datetime.utcnow() - timedelta(days=STATS_WINDOW_DAYS)}
+        }
+        
+        # Aggregate everything server-side in one round trip over the index-backed $match:
+        # per-format counts, rounded totals and the latest item
+        pipeline = [
+            {"$match": query},
+            {"$facet": {
+                "formats": [
+                    {"$group": {"_id": "$input_data.file_format", "count": {"$sum": 1}}}
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "words": {"$sum": "$output_data.word_count"},
+                        "processing_time": {"$sum": "$processing_time"}
+                    }},
+                    {"$addFields": {
+                        "average_processing_time": {"$round": [{"$divide": ["$processing_time", "$total"]}, 2]}
+                    }}
+                ],
+                "latest": [
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "created_at": 1}}
+                ]
+            }}
+        ]
+        result = await history_collection.aggregate(pipeline).to_list(length=1)
+        
+        facets = result[0] if result else {}
+        totals = facets["totals"][0] if facets.get("totals") else {}
+        latest = facets["latest"][0] if facets.get("latest") else {}
         
         # Count by format
-        format_counts = {}
-        for item in voice_history:
-            if item.get("input_data", {}).get("file_format"):
-                format_name = item["input_data"]["file_format"]
-                format_counts[format_name] = format_counts.get(format_name, 0) + 1
+        format_counts = {
+            item["_id"]: item["count"]
+            for item in facets.get("formats", [])
+            if item["_id"]
+        }
         
         return {
-            "total_processed": total_processed,
-            "total_words": total_words,
-            "average_processing_time": round(avg_processing_time, 2),
+            "total_processed": totals.get("total", 0),
+            "total_words": totals.get("words", 0),
+            "average_processing_time": totals.get("average_processing_time", 0),
             "format_breakdown": format_counts,
-            "last_processed": voice_history[-1]["created_at"] if voice_history else None
+            "last_processed": latest.get("created_at"),
+            "window_days": STATS_WINDOW_DAYS
         }
         
     except Exception as e:
@@ -5,7 +5,7 @@ async def analyze_voice_emotion_endpoint(
 ):
     """Analyze voice recording to detect emotional state and provide relevant suggestions."""
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # First, transcribe the audio
         transcribe_result = await transcribe_audio_file(file, current_user)
@@ -32,11 +32,11 @@ async def analyze_voice_emotion_endpoint(
                 detail=f"Emotion analysis failed: {emotion_result['error']}"
             )
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Save to history
-        history_data = HistoryCreate(
-            user_id=str(current_user.id),
+        history_data = build_history_doc(
+            user_id=current_user.firebase_uid,
             feature_type="voice_emotion",
             input_data={
                 "filename": file.filename,
@@ -49,8 +49,7 @@ async def analyze_voice_emotion_endpoint(
             processing_time=processing_time
         )
         
-        history_collection = get_collection("history")
-        await history_collection.insert_one(history_data.dict(by_alias=True))
+        history_writer.put(history_data)
         
         # Add processing time to result
         emotion_result["data"]["processing_time"] = processing_time
@@ -0,0 +1,73 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import orjson
+
+# One in-process cache per AI feature; TTLs follow how deterministic each output is
+AI_CACHES: Dict[str, TTLCache] = {
+    "mindmap": TTLCache(maxsize=512, ttl=24 * 3600),
+    "quiz": TTLCache(maxsize=512, ttl=24 * 3600),
+    "notes_summary": TTLCache(maxsize=512, ttl=3600),
+    "notes_extract": TTLCache(maxsize=512, ttl=3600),
+    "research_summary": TTLCache(maxsize=2048, ttl=24 * 3600),
+    "voice_summary": TTLCache(maxsize=512, ttl=3600),
+    "voice_analysis": TTLCache(maxsize=512, ttl=3600),
+}
+
+# Calls currently running per (namespace, key); concurrent identical requests share one
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+class _LeaderCancelled(Exception):
+    """Set on a shared call whose leading request was cancelled; waiters retry."""
+
+def ai_cache_key(key_dict: Dict[str, Any]) -> str:
+    """Hash the normalized request inputs into a cache key."""
+    return hashlib.blake2b(orjson.dumps(key_dict, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+async def cached_ai_call(
+    namespace: str,
+    key_dict: Dict[str, Any],
+    coro_factory: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Return a cached AI result for identical inputs, calling the service on a miss.
+
+    Concurrent misses for the same inputs wait on a single AI call. Only
+    successful results are cached so transient AI failures are retried;
+    results without a "success" flag count as successful, since those
+    services raise on failure instead. If the request running the shared
+    call is cancelled, its waiters retry rather than seeing the cancellation.
+    """
+    cache = AI_CACHES[namespace]
+    key = ai_cache_key(key_dict)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    inflight_key = (namespace, key)
+    pending = _inflight.get(inflight_key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except _LeaderCancelled:
+            return await cached_ai_call(namespace, key_dict, coro_factory)
+
+    pending = asyncio.get_running_loop().create_future()
+    _inflight[inflight_key] = pending
+    try:
+        result = await coro_factory()
+    except Exception as e:
+        pending.set_exception(e)
+        # Mark the exception as retrieved when nobody else was waiting
+        pending.exception()
+        raise
+    else:
+        pending.set_result(result)
+        if result.get("success", True):
+            cache[key] = result
+        return result
+    finally:
+        _inflight.pop(inflight_key, None)
+        if not pending.done():
+            pending.set_exception(_LeaderCancelled())
+            pending.exception()
@@ -26,6 +26,7 @@ class Settings(BaseSettings):
     
     # Google Gemini API
     gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
     
     # File Upload
     upload_dir: str = "uploads"
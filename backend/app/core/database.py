@@ -1,13 +1,20 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
 from pymongo import MongoClient
+from typing import Dict
+from datetime import datetime
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Collections used on hot request paths; bound once at startup
+PRELOADED_COLLECTIONS = ("users", "history", "image_history", "research_history")
+
 class Database:
     client: AsyncIOMotorClient = None
     sync_client: MongoClient = None
+    database: AsyncIOMotorDatabase = None
+    collections: Dict[str, AsyncIOMotorCollection] = {}
 
 db = Database()
 
@@ -19,24 +26,29 @@ async def connect_to_mongo():
             'serverSelectionTimeoutMS': 5000,  # 5 seconds timeout
             'connectTimeoutMS': 10000,
             'retryWrites': True,
-            'maxPoolSize': 10
+            'maxPoolSize': 100
         }
         
         db.client = AsyncIOMotorClient(settings.mongodb_url, **connection_options)
         db.sync_client = MongoClient(settings.mongodb_url, **connection_options)
+        db.database = db.client[settings.database_name]
+        db.collections = {name: db.database[name] for name in PRELOADED_COLLECTIONS}
         
         # Test the connection
         await db.client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
         
         # Initialize the database and collections if they don't exist
-        database = db.client[settings.database_name]
+        database = db.database
         collections = ['users', 'history']
         for collection in collections:
             if collection not in await database.list_collection_names():
                 await database.create_collection(collection)
                 logger.info(f"Created collection: {collection}")
         
+        await create_indexes(database)
+        await migrate_history_user_ids(database)
+        
     except Exception as e:
         logger.error(f"Could not connect to MongoDB: {e}")
         logger.error(f"MongoDB URL: {settings.mongodb_url}")
@@ -44,15 +56,72 @@ async def connect_to_mongo():
         # Don't raise the error, just log it
         return None
 
+async def create_indexes(database):
+    """Create the indexes used by the auth, history, image and research history queries.
+
+    Each index is created on its own so one failure (e.g. the unique users index
+    over duplicate rows) does not stop the rest from being built.
+    """
+    indexes = [
+        ("users", "firebase_uid", {"unique": True}),
+        # created_at/_id suffixes serve the keyset pagination sort
+        ("history", [("user_id", 1), ("feature_type", 1), ("created_at", -1), ("_id", -1)], {}),
+        ("history", [("user_id", 1), ("created_at", -1), ("_id", -1)], {}),
+        ("image_history", [("user_id", 1), ("created_at", -1), ("_id", -1)], {}),
+        ("image_history", [("user_id", 1), ("content_hash", 1)], {}),
+        ("research_history", [("user_id", 1), ("timestamp", -1)], {}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await database[collection].create_index(keys, **options)
+        except Exception as e:
+            logger.error(f"Could not create MongoDB index {keys} on {collection}: {e}")
+    logger.info("Ensured MongoDB indexes")
+
+# Marker recorded in the "migrations" collection once the history user_id rewrite has run
+HISTORY_USER_ID_MIGRATION = "history_user_id_firebase_uid"
+
+async def migrate_history_user_ids(database):
+    """Rewrite history rows still keyed on the user's ObjectId string to their firebase_uid.
+
+    Runs once; later startups find the marker and skip it.
+    """
+    try:
+        migrations = database["migrations"]
+        if await migrations.find_one({"_id": HISTORY_USER_ID_MIGRATION}, {"_id": 1}):
+            return
+        
+        migrated = 0
+        async for user in database["users"].find({}, {"_id": 1, "firebase_uid": 1}):
+            if not user.get("firebase_uid"):
+                continue
+            legacy = {"user_id": str(user["_id"])}
+            update = {"$set": {"user_id": user["firebase_uid"]}}
+            for name in ("history", "research_history"):
+                result = await database[name].update_many(legacy, update)
+                migrated += result.modified_count
+        await migrations.update_one(
+            {"_id": HISTORY_USER_ID_MIGRATION},
+            {"$setOnInsert": {"applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info(f"Migrated {migrated} history entries to firebase_uid keys")
+    except Exception as e:
+        logger.error(f"Could not migrate history user ids: {e}")
+
 async def close_mongo_connection():
     """Close database connection."""
     if db.client:
         db.client.close()
+        db.collections = {}
         logger.info("MongoDB connection closed")
 
 def get_collection(collection_name: str):
-    """Get a collection from the database."""
-    return db.client[settings.database_name][collection_name]
+    """Get a collection from the database, reusing the bound collection object."""
+    collection = db.collections.get(collection_name)
+    if collection is None:
+        collection = db.collections[collection_name] = db.database[collection_name]
+    return collection
 
 def get_sync_collection(collection_name: str):
     """Get a synchronous collection from the database."""
@@ -0,0 +1,64 @@
+from typing import Sequence, Tuple
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Headroom for multipart boundaries and headers around an uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
+
+class MaxBodySizeMiddleware:
+    """Reject requests whose body exceeds the limit for their path.
+
+    Limits are matched by path prefix; the first match wins. A declared
+    Content-Length over the limit is rejected before the body is read; bodies
+    without one (chunked uploads) are counted as they are received and fail
+    with 413 as soon as they cross the limit.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Sequence[Tuple[str, int]]):
+        self.app = app
+        self.limits = tuple(limits)
+
+    def _limit_for(self, path: str):
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            limit = self._limit_for(scope["path"])
+            if limit is not None:
+                content_length = None
+                for name, value in scope["headers"]:
+                    if name == b"content-length":
+                        content_length = value
+                        break
+                if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+                    response = JSONResponse(
+                        status_code=413,
+                        content={"detail": f"Request body too large. Maximum {limit} bytes allowed."}
+                    )
+                    await response(scope, receive, send)
+                    return
+                receive = self._limited_receive(receive, limit)
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _limited_receive(receive: Receive, limit: int) -> Receive:
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the body is being parsed, so FastAPI renders it as a 413
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Request body too large. Maximum {limit} bytes allowed."
+                    )
+            return message
+
+        return limited_receive
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Any, Dict
+from bson import ObjectId
+import base64
+
+# Sort order that keyset cursors are built against
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    """Encode the (created_at, _id) position of a document as an opaque cursor."""
+    raw = f"{item['created_at'].isoformat()}|{item['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor into a filter matching documents after that position."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, item_id = raw.split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+        item_id = ObjectId(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": item_id}}
+        ]
+    }
@@ -0,0 +1,29 @@
+from fastapi import Depends, HTTPException, status
+from cachetools import TTLCache
+import time
+
+from app.api.auth import get_current_user
+from app.models.user import UserResponse
+
+class RateLimiter:
+    """Fixed-window per-user request limit, usable as a route dependency."""
+
+    def __init__(self, times: int, seconds: int, maxsize: int = 10_000):
+        self.times = times
+        self.seconds = seconds
+        # Counters keyed by (user, window); entries outlive their window by at most one window
+        self.counters: TTLCache = TTLCache(maxsize=maxsize, ttl=2 * seconds)
+
+    async def __call__(self, current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
+        key = (current_user.firebase_uid, int(time.time() // self.seconds))
+        count = self.counters.get(key, 0) + 1
+        self.counters[key] = count
+        if count > self.times:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again shortly."
+            )
+        return current_user
+
+# Shared limit for endpoints that call the AI service
+ai_rate_limit = RateLimiter(times=30, seconds=60)
@@ -0,0 +1,25 @@
+from typing import Any, AsyncIterator
+from bson import ObjectId
+import orjson
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+async def stream_json_array(docs: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """Encode documents from an async iterator as a JSON array, one document at a time.
+
+    Streamed documents skip FastAPI's jsonable_encoder, so raw Mongo values such
+    as ObjectId are converted here.
+    """
+    yield b"["
+    first = True
+    async for doc in docs:
+        if not first:
+            yield b","
+        first = False
+        yield orjson.dumps(doc, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    yield b"]"
@@ -1,7 +1,7 @@
 from .user import UserBase, UserCreate, UserInDB, UserResponse, PyObjectId
-from .history import HistoryBase, HistoryCreate, HistoryInDB, HistoryResponse
+from .history import HistoryBase, HistoryCreate, HistoryInDB, HistoryResponse, build_history_doc
 
 __all__ = [
     "UserBase", "UserCreate", "UserInDB", "UserResponse", "PyObjectId",
-    "HistoryBase", "HistoryCreate", "HistoryInDB", "HistoryResponse"
+    "HistoryBase", "HistoryCreate", "HistoryInDB", "HistoryResponse", "build_history_doc"
 ] 
\ No newline at end of file
@@ -15,6 +15,29 @@ class HistoryBase(BaseModel):
 class HistoryCreate(HistoryBase):
     pass
 
+def build_history_doc(
+    user_id: str,
+    feature_type: str,
+    input_data: Dict[str, Any],
+    output_data: Dict[str, Any],
+    processing_time: Optional[float] = None,
+    status: str = "completed"
+) -> Dict[str, Any]:
+    """Build a history document in the HistoryCreate shape without model validation.
+
+    Handlers assemble these from trusted, already-validated values.
+    """
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "feature_type": feature_type,
+        "input_data": input_data,
+        "output_data": output_data,
+        "processing_time": processing_time,
+        "status": status,
+        "created_at": datetime.utcnow()
+    }
+
 class HistoryInDB(HistoryBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -28,7 +51,4 @@ class HistoryInDB(HistoryBase):
 class HistoryResponse(HistoryBase):
     id: str
     created_at: datetime
-    updated_at: datetime
-
-    class Config:
-        json_encoders = {ObjectId: str} 
\ No newline at end of file
+    updated_at: datetime 
\ No newline at end of file
@@ -21,10 +21,6 @@ class ImageProcessResponse(BaseModel):
     status: str = "completed"
     created_at: datetime
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
-
 class ImageHistoryItem(BaseModel):
     """Model for storing image processing history."""
     user_id: str
@@ -35,12 +31,9 @@ class ImageHistoryItem(BaseModel):
     character_count: int
     processing_time: Optional[float] = None
     status: str = "completed"
+    content_hash: Optional[str] = None  # blake2b of the uploaded bytes, used to dedupe repeat uploads
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
-
 class ImageHistoryInDB(ImageHistoryItem):
     """Model for image history stored in database."""
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
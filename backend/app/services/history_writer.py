@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.database import get_collection
+
+logger = logging.getLogger(__name__)
+
+class HistoryWriter:
+    """Buffers history documents and writes them to Mongo in unordered batches."""
+
+    def __init__(self, collection_name: str = "history", batch_size: int = 100, flush_interval: float = 0.2):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, doc: Dict[str, Any]):
+        """Queue a history document for writing; never blocks the request."""
+        self.queue.put_nowait(doc)
+
+    def start(self):
+        """Start the background consumer."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush queued documents and stop the consumer."""
+        if self._task is None:
+            return
+        self.queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            doc = await self.queue.get()
+            if doc is None:
+                return
+            docs = [doc]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(docs) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if doc is None:
+                    stopping = True
+                    break
+                docs.append(doc)
+            await self._write(docs)
+            if stopping:
+                return
+
+    async def _write(self, docs: List[Dict[str, Any]]):
+        try:
+            await get_collection(self.collection_name).insert_many(docs, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to write {len(docs)} {self.collection_name} items: {e}")
+
+# Create singleton instances
+history_writer = HistoryWriter()
+research_history_writer = HistoryWriter("research_history")
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 import google.generativeai as genai
@@ -16,6 +17,9 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     logger.warning("pytesseract not installed. OCR functionality will be disabled.")
 
+# OCR is CPU-bound; queue bursts of uploads instead of oversubscribing the cores
+OCR_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+
 class ImageService:
     def __init__(self):
         # Configure Gemini
@@ -57,32 +61,37 @@ class ImageService:
         if not self.tesseract_available:
             logger.warning("Tesseract OCR is not available. Text extraction from images will use alternative methods.")
     
+    def _ocr_image(self, image_data: bytes) -> str:
+        """Decode the image and run OCR on it (blocking)."""
+        # Open and validate image
+        try:
+            image = Image.open(io.BytesIO(image_data))
+            image.verify()  # Verify image integrity
+            image = Image.open(io.BytesIO(image_data))  # Reopen after verify
+        except Exception as e:
+            raise ValueError(f"Invalid or corrupted image file: {str(e)}")
+        
+        # Preprocess image for better OCR
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        if self.tesseract_available:
+            # Extract text using pytesseract with improved settings
+            return pytesseract.image_to_string(
+                image,
+                lang='eng',  # English language
+                config='--psm 3'  # Fully automatic page segmentation
+            )
+        # For demonstration, return a message when Tesseract is not available
+        # In a production environment, you might want to implement alternative OCR methods
+        return "Image text extraction is currently unavailable. Please install Tesseract OCR for full functionality."
+    
     async def extract_text_from_image(self, image_data: bytes) -> str:
         """Extract text from image using OCR or alternative methods."""
         try:
-            # Open and validate image
-            try:
-                image = Image.open(io.BytesIO(image_data))
-                image.verify()  # Verify image integrity
-                image = Image.open(io.BytesIO(image_data))  # Reopen after verify
-            except Exception as e:
-                raise ValueError(f"Invalid or corrupted image file: {str(e)}")
-            
-            # Preprocess image for better OCR
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            if self.tesseract_available:
-                # Extract text using pytesseract with improved settings
-                text = pytesseract.image_to_string(
-                    image,
-                    lang='eng',  # English language
-                    config='--psm 3'  # Fully automatic page segmentation
-                )
-            else:
-                # For demonstration, return a message when Tesseract is not available
-                # In a production environment, you might want to implement alternative OCR methods
-                text = "Image text extraction is currently unavailable. Please install Tesseract OCR for full functionality."
+            # Decoding and OCR are CPU-bound; keep them off the event loop
+            async with OCR_SEMAPHORE:
+                text = await asyncio.to_thread(self._ocr_image, image_data)
             
             # Clean up the extracted text
             text = text.strip()
@@ -114,7 +123,7 @@ class ImageService:
             3. Important Details
             """
             
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             
             if not response.text:
                 raise ValueError("No summary generated")
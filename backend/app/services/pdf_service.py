@@ -1,74 +1,199 @@
 import PyPDF2
 import pdfplumber
-import tempfile
+import asyncio
+import hashlib
 import os
 import logging
-from typing import Dict, Any, List
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from cachetools import TTLCache
+from typing import Dict, Any, List, Optional
 import io
 
 logger = logging.getLogger(__name__)
 
-class PDFService:
-    def __init__(self):
-        pass
+# Parsing is CPU-bound and holds the GIL, so it runs in worker processes
+_process_pool: Optional[ProcessPoolExecutor] = None
 
-    async def extract_text_pypdf2(self, pdf_bytes: bytes) -> Dict[str, Any]:
-        """Extract text from PDF using PyPDF2."""
-        try:
-            pdf_file = io.BytesIO(pdf_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text_content = []
-            total_pages = len(pdf_reader.pages)
-            
-            for page_num in range(total_pages):
-                page = pdf_reader.pages[page_num]
+# Smallest page range worth shipping to a separate worker
+MIN_PAGES_PER_SHARD = 8
+
+# Parsed metadata keyed by a hash of the PDF bytes
+info_cache: TTLCache = TTLCache(maxsize=256, ttl=3600)
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared PDF worker pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        # Forking a multithreaded server can deadlock the children; start them from a clean process
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _process_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context(start_method)
+        )
+    return _process_pool
+
+def close_process_pool():
+    """Shut down the PDF worker pool."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+# Module-level so they can be pickled into the worker processes
+
+def _extract_text_pypdf2(pdf_bytes: bytes) -> Dict[str, Any]:
+    """Extract text from PDF using PyPDF2."""
+    try:
+        pdf_file = io.BytesIO(pdf_bytes)
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+
+        text_content = []
+        total_pages = len(pdf_reader.pages)
+
+        for page_num in range(total_pages):
+            page = pdf_reader.pages[page_num]
+            text = page.extract_text()
+            if text.strip():
+                text_content.append({
+                    "page": page_num + 1,
+                    "text": text.strip()
+                })
+
+        full_text = "\n\n".join([page["text"] for page in text_content])
+
+        return {
+            "success": True,
+            "data": {
+                "text": full_text,
+                "pages": text_content,
+                "total_pages": total_pages,
+                "word_count": len(full_text.split()),
+                "extraction_method": "PyPDF2"
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"Error extracting text with PyPDF2: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def _extract_text_pdfplumber(pdf_bytes: bytes) -> Dict[str, Any]:
+    """Extract text from PDF using pdfplumber (better for complex layouts)."""
+    try:
+        pdf_file = io.BytesIO(pdf_bytes)
+
+        text_content = []
+        total_pages = 0
+
+        with pdfplumber.open(pdf_file) as pdf:
+            total_pages = len(pdf.pages)
+
+            for page_num, page in enumerate(pdf.pages):
                 text = page.extract_text()
-                if text.strip():
+                if text and text.strip():
                     text_content.append({
                         "page": page_num + 1,
                         "text": text.strip()
                     })
-            
-            full_text = "\n\n".join([page["text"] for page in text_content])
-            
-            return {
-                "success": True,
-                "data": {
-                    "text": full_text,
-                    "pages": text_content,
-                    "total_pages": total_pages,
-                    "word_count": len(full_text.split()),
-                    "extraction_method": "PyPDF2"
-                }
+
+        full_text = "\n\n".join([page["text"] for page in text_content])
+
+        return {
+            "success": True,
+            "data": {
+                "text": full_text,
+                "pages": text_content,
+                "total_pages": total_pages,
+                "word_count": len(full_text.split()),
+                "extraction_method": "pdfplumber"
             }
-            
-        except Exception as e:
-            logger.error(f"Error extracting text with PyPDF2: {e}")
-            return {
-                "success": False,
-                "error": str(e)
+        }
+
+    except Exception as e:
+        logger.error(f"Error extracting text with pdfplumber: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def _count_pages(pdf_bytes: bytes) -> int:
+    """Count the pages in a PDF."""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+def _extract_pages_pdfplumber(pdf_bytes: bytes, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract text from pages [start, end) using pdfplumber."""
+    text_content = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page_num in range(start, end):
+            text = pdf.pages[page_num].extract_text()
+            if text and text.strip():
+                text_content.append({
+                    "page": page_num + 1,
+                    "text": text.strip()
+                })
+    return text_content
+
+def _get_pdf_info(pdf_bytes: bytes) -> Dict[str, Any]:
+    """Get basic information about the PDF."""
+    try:
+        pdf_file = io.BytesIO(pdf_bytes)
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+
+        info = pdf_reader.metadata
+
+        return {
+            "success": True,
+            "data": {
+                "total_pages": len(pdf_reader.pages),
+                "title": info.get('/Title', 'Unknown'),
+                "author": info.get('/Author', 'Unknown'),
+                "subject": info.get('/Subject', 'Unknown'),
+                "creator": info.get('/Creator', 'Unknown'),
+                "producer": info.get('/Producer', 'Unknown'),
+                "creation_date": info.get('/CreationDate', 'Unknown'),
+                "modification_date": info.get('/ModDate', 'Unknown')
             }
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting PDF info: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+class PDFService:
+    def __init__(self):
+        pass
+
+    async def _run(self, func, *args) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_process_pool(), func, *args)
+
+    async def extract_text_pypdf2(self, pdf_bytes: bytes) -> Dict[str, Any]:
+        """Extract text from PDF using PyPDF2."""
+        return await self._run(_extract_text_pypdf2, pdf_bytes)
 
     async def extract_text_pdfplumber(self, pdf_bytes: bytes) -> Dict[str, Any]:
         """Extract text from PDF using pdfplumber (better for complex layouts)."""
+        return await self._run(_extract_text_pdfplumber, pdf_bytes)
+
+    async def extract_text_pdfplumber_parallel(self, pdf_bytes: bytes) -> Dict[str, Any]:
+        """Extract text with pdfplumber, splitting the pages across the worker pool."""
         try:
-            pdf_file = io.BytesIO(pdf_bytes)
-            
-            text_content = []
-            total_pages = 0
-            
-            with pdfplumber.open(pdf_file) as pdf:
-                total_pages = len(pdf.pages)
-                
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text and text.strip():
-                        text_content.append({
-                            "page": page_num + 1,
-                            "text": text.strip()
-                        })
+            total_pages = await self._run(_count_pages, pdf_bytes)
+            workers = os.cpu_count() or 1
+            shard_size = max(MIN_PAGES_PER_SHARD, -(-total_pages // workers))
+            shards = await asyncio.gather(*[
+                self._run(_extract_pages_pdfplumber, pdf_bytes, start, min(start + shard_size, total_pages))
+                for start in range(0, total_pages, shard_size)
+            ])
             
+            text_content = [page for shard in shards for page in shard]
             full_text = "\n\n".join([page["text"] for page in text_content])
             
             return {
@@ -93,7 +218,7 @@ class PDFService:
         """Extract text using both methods and combine results."""
         try:
             # Try pdfplumber first (better for complex layouts)
-            pdfplumber_result = await self.extract_text_pdfplumber(pdf_bytes)
+            pdfplumber_result = await self.extract_text_pdfplumber_parallel(pdf_bytes)
             
             if pdfplumber_result["success"] and pdfplumber_result["data"]["word_count"] > 0:
                 return pdfplumber_result
@@ -134,26 +259,15 @@ class PDFService:
 
     async def get_pdf_info(self, pdf_bytes: bytes) -> Dict[str, Any]:
         """Get basic information about the PDF."""
+        cache_key = hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+        cached_info = info_cache.get(cache_key)
+        if cached_info is not None:
+            return cached_info
         try:
-            pdf_file = io.BytesIO(pdf_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            info = pdf_reader.metadata
-            
-            return {
-                "success": True,
-                "data": {
-                    "total_pages": len(pdf_reader.pages),
-                    "title": info.get('/Title', 'Unknown'),
-                    "author": info.get('/Author', 'Unknown'),
-                    "subject": info.get('/Subject', 'Unknown'),
-                    "creator": info.get('/Creator', 'Unknown'),
-                    "producer": info.get('/Producer', 'Unknown'),
-                    "creation_date": info.get('/CreationDate', 'Unknown'),
-                    "modification_date": info.get('/ModDate', 'Unknown')
-                }
-            }
-            
+            result = await self._run(_get_pdf_info, pdf_bytes)
+            if result["success"]:
+                info_cache[cache_key] = result
+            return result
         except Exception as e:
             logger.error(f"Error getting PDF info: {e}")
             return {
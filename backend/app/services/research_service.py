@@ -1,5 +1,6 @@
 import scholarly
 from typing import List, Dict, Any
+import asyncio
 import logging
 import json
 from datetime import datetime
@@ -8,6 +9,9 @@ import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
 
+# Papers are summarized concurrently; cap in-flight Gemini calls to stay under provider rate limits
+SUMMARY_SEMAPHORE = asyncio.Semaphore(settings.llm_max_concurrency)
+
 class ResearchService:
     def __init__(self):
         try:
@@ -182,7 +186,8 @@ class ResearchService:
             Respond only with the JSON, no additional text.
             """
 
-            response = self.model.generate_content(prompt)
+            async with SUMMARY_SEMAPHORE:
+                response = await self.model.generate_content_async(prompt)
             response_text = response.text.strip()
             
             # Handle possible formatting issues
@@ -240,7 +245,7 @@ class ResearchService:
             Respond only with the JSON, no additional text.
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             response_text = response.text.strip()
             
             if response_text.startswith('```json'):
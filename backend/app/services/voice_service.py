@@ -1,22 +1,33 @@
 import speech_recognition as sr
 import tempfile
+import shutil
 import os
 import logging
 import sys
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, BinaryIO, Union
 import wave
 import io
 import traceback
 from pydub import AudioSegment
 from werkzeug.utils import secure_filename
-from datetime import datetime
 import json
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Recording blocks for its full duration and there is one input device; run captures one at a time
+MICROPHONE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microphone")
+
+SUPPORTED_AUDIO_FORMATS = ("wav", "mp3", "m4a", "flac", "ogg", "webm")
+
+# Each transcription shells out to FFmpeg and holds a recognizer request; queue bursts of uploads
+TRANSCRIBE_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+# Open streams re-transcribe every second; cap them separately so they cannot starve uploads
+STREAM_TRANSCRIBE_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+
 class VoiceService:
     def __init__(self):
         self.recognizer = sr.Recognizer()
@@ -132,22 +143,54 @@ class VoiceService:
 
     async def transcribe_audio_file(self, audio_file_path: str, original_format: str = "wav") -> Dict[str, Any]:
         """Transcribe audio file to text using Google Speech Recognition."""
+        # Conversion and recognition block; run them off the event loop, a bounded number at a time
+        async with TRANSCRIBE_SEMAPHORE:
+            return await asyncio.to_thread(self._transcribe_file, audio_file_path, original_format)
+
+    async def transcribe_audio_stream(self, stream: BinaryIO, original_format: str = "wav") -> Dict[str, Any]:
+        """Transcribe an uploaded audio stream, such as UploadFile.file."""
+        async with TRANSCRIBE_SEMAPHORE:
+            return await asyncio.to_thread(self._transcribe_stream, stream, original_format)
+
+    def _transcribe_stream(self, stream: BinaryIO, original_format: str) -> Dict[str, Any]:
+        """Transcribe an audio stream synchronously."""
+        stream.seek(0)
+        if original_format.lower() == "wav":
+            # WAV is read straight from the upload's spooled file
+            return self._transcribe_file(stream, "wav")
+        
+        # FFmpeg needs a seekable named input for containers like m4a; spool once into the temp dir
+        with tempfile.NamedTemporaryFile(suffix=f".{original_format}", dir=self.temp_dir, delete=False) as temp_file:
+            shutil.copyfileobj(stream, temp_file, 1024 * 1024)
+            temp_file_path = temp_file.name
+        try:
+            return self._transcribe_file(temp_file_path, original_format)
+        finally:
+            try:
+                os.remove(temp_file_path)
+            except OSError as e:
+                logger.warning(f"Failed to remove temporary file: {str(e)}")
+
+    def _transcribe_file(self, audio_file: Union[str, BinaryIO], original_format: str = "wav") -> Dict[str, Any]:
+        """Transcribe an audio file path or WAV file object synchronously."""
         temp_wav_path = None
         try:
             # Convert to WAV if needed
             if original_format.lower() != "wav":
-                temp_wav_path = self._convert_to_wav(audio_file_path, original_format)
+                temp_wav_path = self._convert_to_wav(audio_file, original_format)
                 process_path = temp_wav_path
             else:
-                process_path = audio_file_path
+                process_path = audio_file
+            
+            # Get audio duration; file objects are rewound for the recognizer
+            with wave.open(process_path, 'rb') as wave_file:
+                duration = wave_file.getnframes() / wave_file.getframerate()
+                sample_rate = wave_file.getframerate()
+            if hasattr(process_path, "seek"):
+                process_path.seek(0)
             
             segments = []
             with sr.AudioFile(process_path) as source:
-                # Get audio duration
-                with wave.open(process_path, 'rb') as wave_file:
-                    duration = wave_file.getnframes() / wave_file.getframerate()
-                    sample_rate = wave_file.getframerate()
-                
                 # Process in 30-second segments if longer than 60 seconds
                 if duration > 60:
                     chunk_duration = 30
@@ -243,6 +286,19 @@ class VoiceService:
                 except:
                     pass
 
+    async def transcribe_chunk(self, pcm: bytes, sample_rate: int, sample_width: int = 2) -> str:
+        """Transcribe a window of raw mono PCM audio; returns "" when no speech is recognized."""
+        async with STREAM_TRANSCRIBE_SEMAPHORE:
+            return await asyncio.to_thread(self._transcribe_pcm, pcm, sample_rate, sample_width)
+
+    def _transcribe_pcm(self, pcm: bytes, sample_rate: int, sample_width: int) -> str:
+        """Transcribe raw PCM audio synchronously."""
+        audio = sr.AudioData(pcm, sample_rate, sample_width)
+        try:
+            return self.recognizer.recognize_google(audio, language="en-IN")
+        except sr.UnknownValueError:
+            return ""
+
     # async def transcribe_audio_file(self, audio_file_path: str, original_format: str = "wav") -> Dict[str, Any]:
     #     """Transcribe audio file to text."""
     #     temp_wav_path = None
@@ -365,6 +421,11 @@ class VoiceService:
 
     async def record_audio(self, duration: int = 10, save_file: bool = True) -> Dict[str, Any]:
         """Record audio from microphone and optionally save to file."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(MICROPHONE_EXECUTOR, self._record_audio, duration, save_file)
+
+    def _record_audio(self, duration: int = 10, save_file: bool = True) -> Dict[str, Any]:
+        """Record audio from microphone synchronously."""
         if not self._has_pyaudio:
             return {
                 "success": False,
@@ -403,14 +464,12 @@ class VoiceService:
                     }
                 
                 if save_file:
-                    # Generate filename with timestamp
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"recording_{timestamp}.wav"
-                    file_path = os.path.join(self.uploads_dir, filename)
-                    
-                    # Save audio data
-                    with open(file_path, "wb") as f:
+                    # Unique name created atomically; second-resolution timestamps collided
+                    with tempfile.NamedTemporaryFile(
+                        dir=self.uploads_dir, prefix="recording_", suffix=".wav", delete=False
+                    ) as f:
                         f.write(audio_data.get_wav_data())
+                        file_path = f.name
                     
                     logger.info(f"Audio saved to {file_path}")
                 
@@ -432,9 +491,15 @@ class VoiceService:
 
     async def transcribe_microphone(self, duration: int = 10) -> Dict[str, Any]:
         """Record and transcribe audio from microphone in real-time."""
+        # Capture blocks for the whole duration; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(MICROPHONE_EXECUTOR, self._transcribe_microphone, duration)
+
+    def _transcribe_microphone(self, duration: int = 10) -> Dict[str, Any]:
+        """Record and transcribe audio from microphone synchronously."""
         try:
             # First record the audio
-            record_result = await self.record_audio(duration=duration, save_file=True)
+            record_result = self._record_audio(duration=duration, save_file=True)
             
             if not record_result["success"]:
                 return record_result
@@ -504,9 +569,7 @@ class VoiceService:
         return {
             "success": True,
             "data": {
-                "supported_formats": [
-                    "wav", "mp3", "m4a", "flac", "ogg", "webm"
-                ],
+                "supported_formats": list(SUPPORTED_AUDIO_FORMATS),
                 "recommended_format": "wav",
                 "max_file_size": "10MB",
                 "recording_limits": {
@@ -545,7 +608,7 @@ class VoiceService:
             }}
             """
             
-            response = model.generate_content(prompt)
+            response = await model.generate_content_async(prompt)
             response_text = response.text.strip()
             
             # Process the response
@@ -595,7 +658,7 @@ class VoiceService:
             }}
             """
             
-            response = model.generate_content(prompt)
+            response = await model.generate_content_async(prompt)
             response_text = response.text.strip()
             
             # Process the response
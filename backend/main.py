@@ -1,5 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from dotenv import load_dotenv
@@ -8,6 +10,9 @@ import os
 from app.api import auth, notes, voice, pdf, quiz, mindmap, eli5, history, image, export, research
 from app.core.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.middleware import MaxBodySizeMiddleware, MULTIPART_OVERHEAD
+from app.services.history_writer import history_writer, research_history_writer
+from app.services.pdf_service import close_process_pool
 
 # Load environment variables
 load_dotenv()
@@ -18,7 +23,41 @@ app = FastAPI(
     description="A comprehensive API for AI-powered educational tools including notes summarization, voice transcription, PDF processing, quiz generation, mind maps, and ELI5 explanations.",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
+)
+
+def validation_error_message(error: dict) -> str:
+    """Turn one Pydantic error into the sentence the handlers used to raise."""
+    field = next((str(part) for part in reversed(error.get("loc", ())) if isinstance(part, str)), "request")
+    field = field.replace("_", " ").capitalize()
+    ctx = error.get("ctx") or {}
+    if error["type"] == "string_too_long":
+        return f"{field} too long. Maximum {ctx['max_length']:,} characters allowed."
+    if error["type"] == "value_error" and "error" in ctx:
+        return str(ctx["error"])
+    return f"{field}: {error['msg']}"
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Report invalid input as a 400 with a string detail, which the frontend renders as-is."""
+    return ORJSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": " ".join(validation_error_message(error) for error in exc.errors())}
+    )
+
+# Reject oversized bodies from their Content-Length before anything is read
+# (added before CORS so the 413 still carries CORS headers)
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    limits=[
+        ("/api/pdf/extract", settings.max_file_size + MULTIPART_OVERHEAD),
+        ("/api/voice/transcribe", settings.max_file_size + MULTIPART_OVERHEAD),
+        ("/api/notes/", 64 * 1024),
+        ("/api/quiz/", 64 * 1024),
+        ("/api/mindmap/", 64 * 1024),
+        ("/api/eli5/", 64 * 1024),
+    ]
 )
 
 # Configure CORS
@@ -63,9 +102,16 @@ async def health_check():
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    auth.get_http_client()
+    history_writer.start()
+    research_history_writer.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await history_writer.stop()
+    await research_history_writer.stop()
+    close_process_pool()
+    await auth.close_http_client()
     await close_mongo_connection()
 
 if __name__ == "__main__":